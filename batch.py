@@ -0,0 +1,96 @@
+from cube import Move
+import facelets
+import numpy as np
+
+
+class CubeBatch:
+    def __init__(self, layers: int, size: int):
+        layers = int(layers)
+        try:
+            assert layers > 1
+            assert size >= 0
+
+        except AssertionError:
+            layers = 2
+            size = 0
+
+        self.layers = layers
+        self.faces = ["F", "B", "R", "L", "U", "D"]
+
+        # each row holds the face index of every facelet, in facelet string order
+        self.initial = np.array(facelets.solved_state(layers), dtype=np.uint8)
+        self.states = np.tile(self.initial, (size, 1))
+
+        # gather indices of every (face, turns, depth) move, followed by the identity permutation
+        table = [
+            facelets.permutation(layers, face, turns, depth)
+            for face in self.faces for turns in range(1, 4) for depth in range(layers)
+        ]
+        table.append(tuple(range(6 * layers ** 2)))
+        self.table = np.array(table, dtype=np.intp)
+
+        # code applying no move, used to pad rows in a vector of moves
+        self.identity = len(table) - 1
+
+    def __len__(self) -> int:
+        return len(self.states)
+
+    @property
+    def solved(self) -> np.ndarray:
+        # detect which cubes in the batch are in their solved state
+        return (self.states == self.initial).all(axis=1)
+
+    def code(self, move: Move) -> int:
+        if move is None:
+            return self.identity
+
+        depth = move.depth if move.depth < self.layers else 0
+        return (self.faces.index(move.face) * 3 + move.turns - 1) * self.layers + depth
+
+    def move(self, code: int) -> Move:
+        if code == self.identity:
+            return None
+
+        face, rest = divmod(code, 3 * self.layers)
+        turns, depth = divmod(rest, self.layers)
+        return Move(self.faces[face], turns + 1, depth)
+
+    def rotate(self, moves) -> None:
+        if isinstance(moves, str):
+            move = Move.from_str(moves)
+            if move is None or move.face not in self.faces:
+                raise ValueError(f"invalid move {moves!r}")
+
+            moves = move
+
+        if isinstance(moves, Move):
+            # same move for every cube in the batch
+            self.states = self.states[:, self.table[self.code(moves)]]
+            return
+
+        # one move per cube, given either as Move objects or as move codes
+        if isinstance(moves, np.ndarray) and moves.dtype.kind in "iu":
+            codes = moves.astype(np.intp)
+
+        else:
+            codes = np.array([move if isinstance(move, (int, np.integer)) else self.code(move) for move in moves], dtype=np.intp)
+
+        if len(codes) != len(self.states):
+            raise ValueError("expected one move per cube in the batch")
+
+        self.states = self.states[np.arange(len(self.states))[:, None], self.table[codes]]
+
+    def evaluate(self, sequence: str) -> None:
+        for move in sequence.split(" "):
+            if move.strip():
+                self.rotate(move)
+
+    def scramble(self, length: int=None) -> np.ndarray:
+        # make independent random moves on every cube, returns the move codes used
+        length = 10 * self.layers if length is None else length
+        rng = np.random.default_rng()
+        codes = rng.integers(0, self.identity, size=(length, len(self.states)))
+        for row in codes:
+            self.rotate(row)
+
+        return codes
@@ -0,0 +1,68 @@
+from cube import Move, RubiksCube
+import json, os, sys, tracemalloc
+
+# memory of each cube size measured by an earlier run with --save, new runs are compared against it. The one kept
+# with the code was measured before moves were shared and the geometry classes were given __slots__
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmark.json")
+
+
+class PlainMove:
+    # a move the way it was before moves were shared, a new object with its own __dict__ for every token
+    def __init__(self, face: str, turns: int=1, depth: int=0):
+        self.face = face
+        self.turns = turns
+        self.depth = depth
+
+
+def measure(build) -> int:
+    # bytes still allocated by whatever build returns
+    tracemalloc.start()
+    kept = build()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del kept
+    return size
+
+
+def cube(layers: int) -> object:
+    cube = RubiksCube(12, layers, 0)
+    cube.running = False
+    return cube
+
+
+def parsed_moves(count: int) -> list:
+    # the same few tokens parsed over and over, like a long algorithm or a loaded save
+    tokens = ["R", "U'", "F2", "L", "D", "B'", "Rw", "M"]
+    return [Move.from_str(tokens[i % len(tokens)]) for i in range(count)]
+
+
+def plain_moves(count: int) -> list:
+    moves = parsed_moves(count)
+    return [PlainMove(move.face, move.turns, move.depth) for move in moves]
+
+
+def reduction(before: int, after: int) -> str:
+    return f"{before / 1024:.0f} KiB -> {after / 1024:.0f} KiB, {100 * (before - after) / before:.0f}% less"
+
+
+if __name__ == "__main__":
+    sizes = {str(layers): measure(lambda: cube(layers)) for layers in range(3, 11)}
+    if "--save" in sys.argv[1:]:
+        with open(BASELINE, "w") as fp:
+            json.dump(sizes, fp, indent=4)
+
+    baseline = {}
+    if os.path.exists(BASELINE):
+        with open(BASELINE, "r") as fp:
+            baseline = json.load(fp)
+
+    print("memory of a new cube" + (", against the saved baseline" if baseline else ""))
+    for layers, size in sizes.items():
+        if layers in baseline:
+            print(f"{layers}x{layers}: {reduction(baseline[layers], size)}")
+
+        else:
+            print(f"{layers}x{layers}: {size / 1024:.0f} KiB")
+
+    # moves are compared with plain objects built for every token, as the list itself is the same size in both
+    print(f"100000 parsed moves against plain objects: {reduction(measure(lambda: plain_moves(100000)), measure(lambda: parsed_moves(100000)))}")
@@ -1,42 +1,425 @@
-from math3d import Matrix3x3, Mesh, Polygon, Triangle, Vector3, rot_x, rot_y, rot_z
-import random, re, threading, time
+from math3d import Matrix3x3, Mesh, Vector3, rot_x, rot_y, rot_z
+import facelets, search
+from array import array
+import functools, heapq, random, re, sys, threading, time
 
 hex_col = re.compile(r"#[\dA-Za-z]{6}")
 
+# half turn, quarter turn and slice turn metrics
+METRICS = ["htm", "qtm", "stm"]
+
+# moves between saved states in the history, jumping anywhere replays at most half this many
+CHECKPOINT_INTERVAL = 64
+
+# seconds between frames of a turning layer, each frame's angle comes from the time since the turn started
+FRAME_TIME = 1 / 60
+
+# lower face, upper face and cube rotation of each axis, with the direction a positive turn follows
+AXES = [("L", "R", "x"), ("D", "U", "y"), ("F", "B", "z")]
+POSITIVE = ["R", "U", "F"]
+
+# face turns with an optional depth, wide turns (Rw, 3Rw, or r, 3r in lower case), slices (M, E, S) and cube rotations
+# (x, y, z), the face is case sensitive as a lower case face is a wide turn
+move_pattern = re.compile(r"(\d*)([FBRLUDMESfbrludxyzXYZ])([wW]?)(2'|2|')?(?:\.(\d+))?$")
+
 
 class Move:
-    def __init__(self, face: str, turns: int=1, depth: int=0):
-        self.face = face
-        self.turns = turns % 4 if turns % 4 else 1  # minimun turn is 1
-        self.depth = depth
+    # moves can't be changed once made, so each distinct move is built once and shared
+    __slots__ = ("face", "turns", "depth")
+    interned = {}
+
+    def __new__(cls, face: str, turns: int=1, depth: int=0):
+        turns = turns % 4 if turns % 4 else 1  # minimun turn is 1
+        move = cls.interned.get((face, turns, depth))
+        if move is None:
+            move = super().__new__(cls)
+            object.__setattr__(move, "face", face)
+            object.__setattr__(move, "turns", turns)
+            object.__setattr__(move, "depth", depth)
+            move = cls.interned.setdefault((face, turns, depth), move)
+
+        return move
+
+    def __setattr__(self, name: str, value) -> None:
+        raise AttributeError("moves are shared and can't be changed")
+
+    def __reduce__(self) -> tuple:
+        return self.__class__, (self.face, self.turns, self.depth)
 
     def __repr__(self):
-        return self.face + ("'" if self.turns == 3 else ("2" if self.turns == 2 else "")) + ("." + str(self.depth) if self.depth else "")
+        turns = "'" if self.turns == 3 else ("2" if self.turns == 2 else "")
+        if self.face.endswith("w"):
+            # wide moves count layers instead, "3Rw" turns the outer three
+            return (str(self.depth + 1) if self.depth > 1 else "") + self.face + turns
+
+        return self.face + turns + ("." + str(self.depth) if self.depth else "")
 
     @property
     def opposite(self):
         return self.__class__(self.face, 4 - self.turns, self.depth)
 
     @classmethod
+    @functools.lru_cache(maxsize=None)
     def from_str(cls, move: str) -> object:
-        if "." in move:
-            move, depth = move.split(".")
-            depth = int(depth)
+        match = move_pattern.match(move.strip())
+        if match is None:
+            return None
+
+        width, face, wide, turns, depth = match.groups()
+        if face in "fbrlud":
+            if wide:
+                return None
+
+            wide = "w"
+
+        face = face.lower() if face.lower() in "xyz" else face.upper()
+        turns = 3 if turns == "'" else (2 if turns else 1)
+
+        if wide:
+            # wide moves turn the outer layers together, depth is the index of the innermost one
+            if face not in "FBRLUD" or depth is not None or (width and int(width) < 2):
+                return None
+
+            return cls(face + "w", turns, int(width) - 1 if width else 1)
+
+        if width or (depth is not None and face not in "FBRLUD"):
+            return None
+
+        return cls(face, turns, int(depth) if depth else 0)
+
+
+class History:
+    # moves packed into one 16 bit code each, ((depth * faces) + face) * 4 + turns, with 0 standing for no move
+    FACES = ["F", "B", "R", "L", "U", "D", "Fw", "Bw", "Rw", "Lw", "Uw", "Dw", "M", "E", "S", "x", "y", "z"]
+
+    def __init__(self, moves: list=None):
+        self.codes = array("H")
+        for move in moves or []:
+            self.append(move)
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self.move(code) for code in self.codes[index]]
+
+        return self.move(self.codes[index])
+
+    def __iter__(self):
+        return map(self.move, self.codes)
+
+    @classmethod
+    def code(cls, move: Move) -> int:
+        if move is None:
+            return 0
+
+        return (move.depth * len(cls.FACES) + cls.FACES.index(move.face)) * 4 + move.turns
+
+    @classmethod
+    def move(cls, code: int) -> Move:
+        if not code:
+            return None
+
+        rest, turns = divmod(code, 4)
+        depth, face = divmod(rest, len(cls.FACES))
+        return Move(cls.FACES[face], turns, depth)
+
+    def append(self, move: Move) -> None:
+        self.codes.append(self.code(move))
+
+    def to_bytes(self, start: int=0, stop: int=None) -> bytes:
+        # codes are always stored little endian
+        codes = self.codes[start:stop]
+        if sys.byteorder == "big":
+            codes.byteswap()
+
+        return codes.tobytes()
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> object:
+        history = cls()
+        history.extend(data)
+        return history
+
+    def extend(self, data: bytes) -> None:
+        codes = array("H", data)
+        if sys.byteorder == "big":
+            codes.byteswap()
+
+        self.codes.extend(codes)
+
+
+def slice_depths(layers: int) -> list:
+    # layers turned by M, E and S, both central layers on even cubes
+    middle = layers // 2
+    depths = [middle] if layers % 2 else [middle - 1, middle]
+    return [depth for depth in depths if 0 < depth < layers - 1]
+
+
+def move_cost(move: Move, layers: int, metric: str="htm") -> int:
+    if move.face in ["x", "y", "z"]:
+        # cube rotations are free in every metric
+        return 0
+
+    if move.face in ["M", "E", "S"] and not slice_depths(layers):
+        return 0
+
+    quarters = 2 if move.turns == 2 else 1
+    inner = move.face in ["M", "E", "S"] or (len(move.face) == 1 and 0 < move.depth < layers - 1)
+    if metric == "stm":
+        return 1
+
+    if metric == "qtm":
+        return quarters * (2 if inner else 1)
+
+    # half turn metric, a slice is the same as turning both outer layers
+    return 2 if inner else 1
+
+
+def count_moves(moves: list, layers: int) -> dict:
+    # history keeps half turns as two quarter turns, merge repeated turns of a layer before counting
+    merged = []
+    for move in moves:
+        if move is None:
+            continue
+
+        if merged and (merged[-1].face, merged[-1].depth) == (move.face, move.depth):
+            turns = (merged[-1].turns + move.turns) % 4
+            merged.pop()
+            if turns:
+                merged.append(Move(move.face, turns, move.depth))
 
         else:
-            depth = 0
+            merged.append(move)
+
+    return {metric: sum(move_cost(move, layers, metric) for move in merged) for metric in METRICS}
+
+
+def axis_turns(move: Move, layers: int) -> tuple:
+    # axis of a move and its quarter turns in the positive direction for each layer along the axis
+    turns = [0] * layers
+    if move.face in ["x", "y", "z"]:
+        return "xyz".index(move.face), [move.turns] * layers
+
+    if move.face in ["M", "E", "S"]:
+        # slices follow L, D and F
+        axis = "MES".index(move.face)
+        for depth in slice_depths(layers):
+            turns[depth] = move.turns if AXES[axis][0] == POSITIVE[axis] else -move.turns
+
+        return axis, turns
+
+    face = move.face[0]
+    axis = [i for i, faces in enumerate(AXES) if face in faces][0]
+    depth = move.depth if move.depth < layers else 0
+    depths = range(min(depth, layers - 1) + 1) if move.face.endswith("w") else [depth]
+    for depth in depths:
+        layer = depth if face == AXES[axis][0] else layers - depth - 1
+        turns[layer] = move.turns if face == POSITIVE[axis] else -move.turns
+
+    return axis, turns
+
+
+def block_move(axis: int, low: int, high: int, turns: int, layers: int) -> Move:
+    # single move turning layers low to high of an axis by quarter turns in the positive direction
+    if low == 0 and high == layers - 1:
+        return Move(AXES[axis][2], turns % 4)
+
+    if low == 0:
+        face = AXES[axis][0]
+        depth = high
+
+    elif high == layers - 1:
+        face = AXES[axis][1]
+        depth = layers - low - 1
+
+    elif list(range(low, high + 1)) == slice_depths(layers):
+        face = AXES[axis][0]
+        return Move("MES"[axis], (turns if face == POSITIVE[axis] else -turns) % 4)
+
+    else:
+        # inner layers are written from the lower face, like in history
+        face = AXES[axis][0]
+        depth = low
+
+    turns = (turns if face == POSITIVE[axis] else -turns) % 4
+    if low != high:
+        return Move(face + "w", turns, depth)
+
+    return Move(face, turns, depth)
+
+
+@functools.lru_cache(maxsize=None)
+def cheapest_blocks(layers: int, metric: str) -> dict:
+    # cheapest way of making every combination of layer turns along one axis, found with dijkstra
+    blocks = [(0, high) for high in range(layers - 1)]
+    blocks += [(low, layers - 1) for low in range(1, layers)]
+    blocks += [(i, i) for i in range(1, layers - 1)]
+    if layers % 2 == 0 and slice_depths(layers):
+        blocks.append((layers // 2 - 1, layers // 2))
+
+    moves = []
+    for low, high in blocks:
+        for turns in range(1, 4):
+            move = block_move(0, low, high, turns, layers)
+            moves.append((low, high, turns, (move_cost(move, layers, metric), 1)))
+
+    start = (0,) * layers
+    best = {start: ((0, 0), [])}
+    queue = [((0, 0), start)]
+    while queue:
+        cost, state = heapq.heappop(queue)
+        if cost > best[state][0]:
+            continue
+
+        for low, high, turns, move_cost_ in moves:
+            new = tuple((v + turns) % 4 if low <= i <= high else v for i, v in enumerate(state))
+            new_cost = (cost[0] + move_cost_[0], cost[1] + move_cost_[1])
+            if new not in best or new_cost < best[new][0]:
+                best[new] = (new_cost, best[state][1] + [(low, high, turns)])
+                heapq.heappush(queue, (new_cost, new))
+
+    return best
+
+
+def simplify(moves: list, layers: int, metric: str="htm") -> list:
+    # merge consecutive moves on the same axis and rewrite them as cheaply as possible for the metric
+    groups = []
+    for move in moves:
+        if move is None:
+            continue
+
+        axis, turns = axis_turns(move, layers)
+        if groups and groups[-1][0] == axis:
+            turns = [(a + b) % 4 for a, b in zip(groups.pop()[1], turns)]
+
+        # moves that cancel out let the moves either side of them merge
+        if any(v % 4 for v in turns):
+            groups.append((axis, turns))
+
+    result = []
+    for axis, turns in groups:
+        options = []
+        for rotation in range(4):
+            # turning the whole cube is free, so every layer can be offset by the same amount
+            state = tuple((v - rotation) % 4 for v in turns)
+            if layers <= 6:
+                cost, blocks = cheapest_blocks(layers, metric)[state]
 
-        if move in ["F", "B", "U", "D", "R", "L"]:
-            return cls(move, 1, depth)
+            else:
+                # too many combinations to search, turn each layer on its own
+                blocks = [(i, i, v) for i, v in enumerate(state) if v]
+                cost = (sum(move_cost(block_move(axis, *block, layers), layers, metric) for block in blocks), len(blocks))
+
+            options.append(((cost[0], cost[1] + (rotation != 0)), rotation != 0, rotation, blocks))
+
+        _, _, rotation, blocks = min(options, key=lambda option: option[:3])
+        result.extend(block_move(axis, low, high, v, layers) for low, high, v in blocks)
+        if rotation:
+            result.append(block_move(axis, 0, layers - 1, rotation, layers))
+
+    return result
+
+
+# last layer algorithms in the usual notation for the last layer on top, 57 orientation cases then 21 permutation cases
+OLL = [
+    "R U2 R2 F R F' U2 R' F R F'", "F R U R' U' F' Fw R U R' U' Fw'", "Fw R U R' U' Fw' U' F R U R' U' F'",
+    "Fw R U R' U' Fw' U F R U R' U' F'", "Rw' U2 R U R' U Rw", "Rw U2 R' U' R U' Rw'", "Rw U R' U R U2 Rw'",
+    "Rw' U' R U' R' U2 Rw", "R U R' U' R' F R2 U R' U' F'", "R U R' U R' F R F' R U2 R'",
+    "Rw U R' U R' F R F' R U2 Rw'", "F R U R' U' F' U F R U R' U' F'", "F U R U' R2 F' R U R U' R'",
+    "R' F R U R' F' R F U' F'", "Rw' U' Rw R' U' R U Rw' U Rw", "Rw U Rw' R U R' U' Rw U' Rw'",
+    "R U R' U R' F R F' U2 R' F R F'", "Rw U R' U R U2 Rw2 U' R U' R' U2 Rw", "M U R U R' U' M' R' F R F'",
+    "Rw U R' U' M2 U R U' R' U' M'", "R U2 R' U' R U R' U' R U' R'", "R U2 R2 U' R2 U' R2 U2 R",
+    "R2 D' R U2 R' D R U2 R", "Rw U R' U' Rw' F R F'", "F' Rw U R' U' Rw' F R", "R U2 R' U' R U' R'",
+    "R U R' U R U2 R'", "Rw U R' U' Rw' R U R U' R'", "R U R' U' R U' R' F' U' F R U R'",
+    "F R' F R2 U' R' U' R U R' F2", "R' U' F U R U' R' F' R", "L U F' U' L' U L F L'", "R U R' U' R' F R F'",
+    "R U R2 U' R' F R U R U' F'", "R U2 R2 F R F' R U2 R'", "L' U' L U' L' U L U L F' L' F",
+    "F R' F' R U R U' R'", "R U R' U R U' R' U' R' F R F'", "L F' L' U' L U F U' L'", "R' F R U R' U' F' U R",
+    "R U R' U R U2 R' F R U R' U' F'", "R' U' R U' R' U2 R F R U R' U' F'", "F' U' L' U L F", "F U R U' R' F'",
+    "F R U R' U' F'", "R' U' R' F R F' U R", "R' U' R' F R F' R' F R F' U R", "F R U R' U' R U R' U' F'",
+    "Rw U' Rw2 U Rw2 U Rw2 U' Rw", "Rw' U Rw2 U' Rw2 U' Rw2 U Rw'", "F U R U' R' U R U' R' F'",
+    "R U R' U R U' B U' B' R'", "Rw' U' R U' R' U R U' R' U2 Rw", "Rw U R' U R U' R' U R U2 Rw'",
+    "R' F R U R U' R2 F' R2 U' R' U R U R'", "Rw' U' Rw U' R' U R U' R' U R Rw' U Rw", "R U R' U' M' U R U' Rw'"
+]
+
+PLL = [
+    "x R' U R' D2 R U' R' D2 R2 x'", "x R2 D2 R U R' D2 R U' R x'", "x' R U' R' D R U R' D' R U R' D R U' R' D' x",
+    "R' U' F' R U R' U' R' F R2 U' R' U' R U R' U R", "R2 U R' U R' U' R U' R2 U' D R' U R D'",
+    "R' U' R U D' R2 U R' U R U' R U' R2 D", "R2 U' R U' R U R' U R2 U D' R U' R' D",
+    "R U R' U' D R2 U' R U' R' U R' U R2 D'", "M2 U M2 U2 M2 U M2", "L' U' L F L' U' L U L F' L2 U L",
+    "R U R' F' R U R' U' R' F R2 U' R'", "R U R' U R U R' F' R U R' U' R' F R2 U' R' U2 R U' R'",
+    "R' U R U' R' F' U' F R U R' F R' F' R U' R", "R U' R' U' R U R D R' U' R D' R' U2 R'",
+    "R2 F R U R U' R' F' R U2 R' U2 R", "R U R' U' R' F R2 U' R' U' R U R' F'", "M2 U M U2 M' U M2",
+    "M2 U' M U2 M' U' M2", "R' U R' U' B' R' B2 U' B' U B' R B R", "F R U' R' U' R U R' F' R U R' U' R' F R F'",
+    "M' U M2 U M2 U M' U2 M2"
+]
+
+# stickers making up the last layer on the bottom face, the yellow face then the bottom row of each side
+LAST_LAYER = list(range(27, 36)) + [face * 9 + i for face in [1, 2, 4, 5] for i in range(6, 9)]
+
+
+def turn_facelets(state: str, moves: list, layers: int) -> str:
+    # apply moves to a facelet string, turning each layer of the move's axis
+    for move in moves:
+        axis, turns = axis_turns(move, layers)
+        face = POSITIVE[axis]
+        for layer, v in enumerate(turns):
+            if v % 4:
+                depth = layers - layer - 1 if facelets.QUARTER_TURNS[face][2] else layer
+                perm = facelets.permutation(layers, face, v % 4, depth)
+                state = "".join(state[i] for i in perm)
+
+    return state
+
+
+@functools.lru_cache(maxsize=None)
+def cube_rotations() -> tuple:
+    # whole cube rotations reaching each of the 24 orientations, bring a face to the top then turn about it
+    tops = [[], ["x"], ["x", "x"], ["x'"], ["z"], ["z'"]]
+    return tuple(
+        tuple(Move.from_str(move) for move in top + spin)
+        for top in tops for spin in [[], ["y"], ["y2"], ["y'"]]
+    )
+
+
+def last_layer_key(state: str, step: str) -> str:
+    # which last layer stickers are yellow for orientation, how far each side sticker is from its own face for permutation
+    if step == "oll":
+        return "".join("1" if state[i] == state[31] else "0" for i in LAST_LAYER)
+
+    # side faces in the order the bottom layer turns them, measured from the first sticker so turning the layer after
+    # the algorithm doesn't change the case
+    ring = [state[face * 9 + 4] for face in [2, 1, 5, 4]]
+    offsets = [(ring.index(state[i]) - ring.index(state[i // 9 * 9 + 4])) % 4 for i in LAST_LAYER[9:]]
+    return "".join(str((offset - offsets[0]) % 4) for offset in offsets)
+
+
+@functools.lru_cache(maxsize=None)
+def last_layer_cases(step: str) -> dict:
+    # case key of every algorithm, found by undoing it on a solved cube turned over so the last layer is on the bottom
+    cases = {}
+    for sequence in OLL if step == "oll" else PLL:
+        moves = []
+        for move in sequence.split():
+            move = Move.from_str(move)
+            face = {"U": "D", "D": "U", "F": "B", "B": "F"}.get(move.face[0], move.face[0])
+            moves.append(Move(face + move.face[1:], move.turns, move.depth))
 
-        elif move.endswith("'"):
-            return cls(move[:-1], 3, depth)
+        state = turn_facelets("".join(facelets.FACES[i] for i in facelets.solved_state(3)), [move.opposite for move in reversed(moves)], 3)
+        cases[last_layer_key(state, step)] = " ".join(map(str, moves))
 
-        elif move.endswith("2"):
-            return cls(move[:-1], 2, depth)
+    return cases
 
 
 class Center(Mesh):
+    __slots__ = ("col", "width", "pos", "orient", "initial_orient", "instant_matrix", "rotation")
+
+    shape = (
+        # top
+        (Vector3(1, 1, -1), Vector3(-1, 1, -1), Vector3(-1, 1, 1), Vector3(1, 1, 1)),
+    )
+
     def __init__(self, pos: Vector3, col: str, width: float):
         # replace invalid colours with white
         try:
@@ -46,11 +429,7 @@ class Center(Mesh):
             col = "#ffffff"
 
         self.col = col
-        self.polys = [Polygon(
-            # top
-            Triangle(Vector3(1, 1, -1), Vector3(-1, 1, -1), Vector3(-1, 1, 1), col),
-            Triangle(Vector3(-1, 1, 1), Vector3(1, 1, 1), Vector3(1, 1, -1), col)
-        )]
+        super().__init__()
 
         self.scale(width / 2)
         self.translate(pos)
@@ -63,20 +442,24 @@ class Center(Mesh):
         # combined rotation matrix for instant load
         self.instant_matrix = Matrix3x3([[1, 0, 0], [0, 1, 0], [0, 0, 1]])
 
-    def copy(self) -> object:
-        new = self.__class__(self.pos, self.col, self.width)
-        new.polys = []
-        for poly in self.polys:
-            new_poly = Polygon()
-            for tri in poly.triangles:
-                new_poly.triangles.append(Triangle(tri.p1.copy(), tri.p2.copy(), tri.p3.copy(), tri.col))
-
-            new.polys.append(new_poly)
+        # exact rotation from the piece's solved position, kept up to date as soon as a move is made
+        self.rotation = facelets.IDENTITY
 
-        return new
+    @property
+    def cols(self) -> tuple:
+        return (self.col,)
 
 
 class Edge(Mesh):
+    __slots__ = ("col1", "col2", "width", "pos", "orient", "initial_orient", "instant_matrix", "rotation")
+
+    shape = (
+        # top
+        (Vector3(1, 1, -1), Vector3(-1, 1, -1), Vector3(-1, 1, 1), Vector3(1, 1, 1)),
+        # front
+        (Vector3(1, -1, -1), Vector3(-1, -1, -1), Vector3(-1, 1, -1), Vector3(1, 1, -1))
+    )
+
     def __init__(self, pos: Vector3, col1: str, col2: str, width: float, orient: int):
         # replace invalid colours with white
         try:
@@ -88,18 +471,7 @@ class Edge(Mesh):
 
         self.col1 = col1
         self.col2 = col2
-        self.polys = [
-            # top
-            Polygon(
-                Triangle(Vector3(1, 1, -1), Vector3(-1, 1, -1), Vector3(-1, 1, 1), col1),
-                Triangle(Vector3(-1, 1, 1), Vector3(1, 1, 1), Vector3(1, 1, -1), col1),
-            ),
-            # front
-            Polygon(
-                Triangle(Vector3(1, -1, -1), Vector3(-1, -1, -1), Vector3(-1, 1, -1), col2),
-                Triangle(Vector3(-1, 1, -1), Vector3(1, 1, -1), Vector3(1, -1, -1), col2)
-            )
-        ]
+        super().__init__()
 
         self.scale(width / 2)
         self.translate(pos)
@@ -112,20 +484,26 @@ class Edge(Mesh):
         # combined rotation matrix for instant load
         self.instant_matrix = Matrix3x3([[1, 0, 0], [0, 1, 0], [0, 0, 1]])
 
-    def copy(self) -> object:
-        new = self.__class__(self.pos, self.col1, self.col2, self.width, self.orient)
-        new.polys = []
-        for poly in self.polys:
-            new_poly = Polygon()
-            for tri in poly.triangles:
-                new_poly.triangles.append(Triangle(tri.p1.copy(), tri.p2.copy(), tri.p3.copy(), tri.col))
-
-            new.polys.append(new_poly)
+        # exact rotation from the piece's solved position, kept up to date as soon as a move is made
+        self.rotation = facelets.IDENTITY
 
-        return new
+    @property
+    def cols(self) -> tuple:
+        return (self.col1, self.col2)
 
 
 class Corner(Mesh):
+    __slots__ = ("col1", "col2", "col3", "width", "pos", "orient", "initial_orient", "instant_matrix", "rotation")
+
+    shape = (
+        # top
+        (Vector3(1, 1, -1), Vector3(-1, 1, -1), Vector3(-1, 1, 1), Vector3(1, 1, 1)),
+        # front
+        (Vector3(1, -1, -1), Vector3(-1, -1, -1), Vector3(-1, 1, -1), Vector3(1, 1, -1)),
+        # right
+        (Vector3(1, -1, 1), Vector3(1, -1, -1), Vector3(1, 1, -1), Vector3(1, 1, 1))
+    )
+
     def __init__(self, pos: Vector3, col1: str, col2: str, col3: str, width: float, orient: int):
         # replace invalid colours with white
         try:
@@ -139,23 +517,7 @@ class Corner(Mesh):
         self.col1 = col1
         self.col2 = col2
         self.col3 = col3
-        self.polys = [
-            # top
-            Polygon(
-                Triangle(Vector3(1, 1, -1), Vector3(-1, 1, -1), Vector3(-1, 1, 1), col1),
-                Triangle(Vector3(-1, 1, 1), Vector3(1, 1, 1), Vector3(1, 1, -1), col1),
-            ),
-            # front
-            Polygon(
-                Triangle(Vector3(1, -1, -1), Vector3(-1, -1, -1), Vector3(-1, 1, -1), col2),
-                Triangle(Vector3(-1, 1, -1), Vector3(1, 1, -1), Vector3(1, -1, -1), col2),
-            ),
-            # right
-            Polygon(
-                Triangle(Vector3(1, -1, 1), Vector3(1, -1, -1), Vector3(1, 1, -1), col3),
-                Triangle(Vector3(1, 1, -1), Vector3(1, 1, 1), Vector3(1, -1, 1), col3)
-            )
-        ]
+        super().__init__()
 
         self.scale(width / 2)
         self.translate(pos)
@@ -168,21 +530,16 @@ class Corner(Mesh):
         # combined rotation matrix for instant load
         self.instant_matrix = Matrix3x3([[1, 0, 0], [0, 1, 0], [0, 0, 1]])
 
-    def copy(self) -> object:
-        new = self.__class__(self.pos, self.col1, self.col2, self.col3, self.width, self.orient)
-        new.polys = []
-        for poly in self.polys:
-            new_poly = Polygon()
-            for tri in poly.triangles:
-                new_poly.triangles.append(Triangle(tri.p1.copy(), tri.p2.copy(), tri.p3.copy(), tri.col))
+        # exact rotation from the piece's solved position, kept up to date as soon as a move is made
+        self.rotation = facelets.IDENTITY
 
-            new.polys.append(new_poly)
-
-        return new
+    @property
+    def cols(self) -> tuple:
+        return (self.col1, self.col2, self.col3)
 
 
 class RubiksCube:
-    def __init__(self, width: float, layers: int, turn_duration: float):
+    def __init__(self, width: float, layers: int, turn_duration: float, max_latency: float=1500):
         self.white = "#ffffff"
         self.yellow = "#ffff00"
         self.red = "#ff0000"
@@ -204,9 +561,15 @@ class RubiksCube:
         layers = int(layers)
         self.layers = layers
 
-        self.history = [None]
+        self.history = History([None])
         self.history_index = 0
 
+        # index the last move made will have in the history, ahead of history_index while moves wait to be shown
+        self.recorded_index = 0
+
+        # states at every CHECKPOINT_INTERVAL moves through the history, saved as moves are made and as they are passed
+        self.checkpoints = {}
+
         try:
             assert layers > 1
             assert isinstance(width, (int, float))
@@ -385,13 +748,42 @@ class RubiksCube:
 
         # initialize movement thread
         self.running = True
-        self.tmp_pieces = self.pieces
-        self.moving_threads = []
+        self.publish()
+        # animations waiting to be played, each a method and its arguments
+        self.moving_queue = []
         self.moving = False
+        # set when a movement is queued, so the movement thread can sleep while there is nothing to play
+        self.queued = threading.Event()
         threading.Thread(target=self.handle_movement, daemon=True).start()
         self.duration = turn_duration
+
+        # time between animation frames, made longer to show fewer frames when drawing them can't keep up
+        self.frame_time = FRAME_TIME
+
+        # longest the animations may fall behind the moves made in milliseconds, queued turns are sped up to keep to it
+        self.max_latency = max_latency
         self.opposite_faces = {"F": "B", "B": "F", "R": "L", "L": "R", "U": "D", "D": "U"}
 
+        # moves made by evaluate are animated unless the cube is only used for working out solutions
+        self.animate = True
+
+        # orientation of the cube from whole cube rotations, the view frame lags behind until queued moves are shown
+        self.frame = facelets.IDENTITY
+        self.view_frame = Matrix3x3([[1, 0, 0], [0, 1, 0], [0, 0, 1]])
+
+        # every jump back towards the start can begin from the solved state
+        self.checkpoint()
+
+        # face each colour belongs to in facelet strings
+        self.colour_faces = {
+            self.white: "U",
+            self.blue: "R",
+            self.red: "F",
+            self.yellow: "D",
+            self.green: "L",
+            self.orange: "B"
+        }
+
     @property
     def solved(self) -> bool:
         # detect if the cube is in its solved state
@@ -402,14 +794,17 @@ class RubiksCube:
             zip(pieces, initial)
         ))
 
-    def rotate(self, move: Move, show: bool=True, history: bool=True) -> None:
+    def rotate(self, move: Move, show: bool=True, history: bool=True, record: Move=None, relabel: bool=False) -> None:
         face = move.face + ("2" if move.turns == 2 else ("'" if move.turns == 3 else ""))
         depth = move.depth
-        if history:
-            while self.history_index != len(self.history) - 1:
-                self.history_index += 1
-                move = self.history[self.history_index]
-                self.rotate(move, True, False)
+        if history and self.history_index != len(self.history) - 1:
+            # moves after the current point in the history are made again before the new one
+            self.jump(len(self.history) - 1)
+
+        if move.face not in self.opposite_faces:
+            # wide moves, slices and cube rotations
+            self.rotate_block(move, show, history)
+            return
 
         if depth >= self.layers:
             # if depth to large rotate the first piece
@@ -695,70 +1090,154 @@ class RubiksCube:
 
         elif face.endswith("'"):
             # reverse patterns, anti-clockwise instead of clockwise
-            self.rotate(Move(self.opposite_faces[face[:-1]], 1, self.layers - depth - 1), show, history)
+            self.rotate(Move(self.opposite_faces[face[:-1]], 1, self.layers - depth - 1), show, history, record, relabel)
             return
 
         elif face.endswith("2"):
             # 180 degree turn
-            [self.rotate(Move(face[:-1], 1, depth), show, history) for _ in range(2)]
+            [self.rotate(Move(face[:-1], 1, depth), show, history, record, relabel) for _ in range(2)]
+            return
+
+        # track exact piece rotations for facelet export
+        matrix = facelets.QUARTER_TURNS[face][0]
+        for piece in self.layer(face, depth):
+            piece.rotation = facelets.compose(matrix, piece.rotation)
+
+        if relabel:
+            # cube rotations only relabel the pieces, their geometry is drawn through the frame
             return
 
         # get copy of pieces to allow updating future positions before the actual pieces have stopped rotating
         pieces = [[[piece for piece in y] for y in z] for z in self.pieces]
 
         if show:
-            self.moving_threads.append(threading.Thread(target=self.rotate_pieces, args=(face, depth, 3, pieces, history)))
+            self.moving_queue.append((self.rotate_pieces, (face, depth, pieces, history, record, self.frame, time.perf_counter() + self.max_latency / 1000)))
+            self.queued.set()
 
         else:
             # apply moves to each pieces instant rotation matrix
-            if face == "F":
-                for i in range(self.layers):
-                    for j in range(self.layers):
-                        if self.pieces[depth][i][j] is not None:
-                            self.pieces[depth][i][j].instant_matrix = rot_z(90) * self.pieces[depth][i][j].instant_matrix 
-
-            elif face == "B":
-                for i in range(self.layers):
-                    for j in range(self.layers):
-                        if self.pieces[depth][i][j] is not None:
-                            self.pieces[depth][i][j].instant_matrix = rot_z(-90) * self.pieces[depth][i][j].instant_matrix
-
-            elif face == "R":
-                for i in range(self.layers):
-                    for j in range(self.layers):
-                        if self.pieces[i][j][depth] is not None:
-                            self.pieces[i][j][depth].instant_matrix = rot_x(-90) * self.pieces[i][j][depth].instant_matrix
-
-            elif face == "L":
-                for i in range(self.layers):
-                    for j in range(self.layers):
-                        if self.pieces[i][j][depth] is not None:
-                            self.pieces[i][j][depth].instant_matrix = rot_x(90) * self.pieces[i][j][depth].instant_matrix
-
-            elif face == "U":
-                for i in range(self.layers):
-                    for j in range(self.layers):
-                        if self.pieces[i][depth][j] is not None:
-                            self.pieces[i][depth][j].instant_matrix = rot_y(-90) * self.pieces[i][depth][j].instant_matrix
-
-            elif face == "D":
-                for i in range(self.layers):
-                    for j in range(self.layers):
-                        if self.pieces[i][depth][j] is not None:
-                            self.pieces[i][depth][j].instant_matrix = rot_y(90) * self.pieces[i][depth][j].instant_matrix
+            matrix = self.layer_matrix(face, 90, self.frame)
+            for piece in self.layer(face, depth):
+                piece.instant_matrix = matrix * piece.instant_matrix
 
             if history:
-                self.update_history(face, depth)
+                self.update_history(face, depth, record)
+
+        if history:
+            self.record_checkpoint()
+
+    def rotate_block(self, move: Move, show: bool, history: bool) -> None:
+        if move.face in ["x", "y", "z"]:
+            self.rotate_frame(move, show, history)
+            return
+
+        if move.face in ["M", "E", "S"]:
+            # slices follow L, D and F, even cubes turn both central layers
+            face = {"M": "L", "E": "D", "S": "F"}[move.face]
+            depths = slice_depths(self.layers)
+
+        elif move.face[:-1] in self.opposite_faces:
+            # wide moves turn every layer up to their depth
+            face = move.face[:-1]
+            depths = list(range(min(move.depth, self.layers - 1) + 1))
+
+        else:
+            return
+
+        # recorded as one move per quarter turn, like single layer moves
+        quarter = Move(move.face, 3 if move.turns == 3 else 1, move.depth)
+        for _ in range(2 if move.turns == 2 else 1):
+            for i, depth in enumerate(depths):
+                # recorded with the last layer so the checkpoint taken for it has every layer turned
+                self.rotate(Move(face, quarter.turns, depth), show, history and i == len(depths) - 1, quarter)
+
+    def rotate_frame(self, move: Move, show: bool, history: bool) -> None:
+        # relabel every layer instead of turning the cube, the new frame is applied when drawing
+        face = {"x": "R", "y": "U", "z": "F"}[move.face]
+        matrix = facelets.QUARTER_TURNS[face][0]
+        for _ in range(move.turns):
+            for depth in range(self.layers):
+                self.rotate(Move(face, 1, depth), False, False, relabel=True)
+
+            self.frame = facelets.compose(matrix, self.frame)
+
+        if show:
+            # keep in step with queued moves that were made in the old frame
+            self.moving_queue.append((self.update_frame, (self.frame, move if history else None)))
+            self.queued.set()
+
+        else:
+            self.update_frame(self.frame, move if history else None)
+
+        if history:
+            self.record_checkpoint()
+
+    def update_frame(self, frame: tuple, move: Move=None) -> None:
+        self.view_frame = Matrix3x3([list(row) for row in frame])
+        if move is not None:
+            self.update_history(None, None, move)
+
+    def layer_matrix(self, face: str, angle: float, frame: tuple) -> Matrix3x3:
+        # geometry rotation of a layer, made in the frame the cube is drawn in
+        if face in ["F", "L", "D"]:
+            matrix = {"F": rot_z, "L": rot_x, "D": rot_y}[face](angle)
+
+        else:
+            matrix = {"B": rot_z, "R": rot_x, "U": rot_y}[face](-angle)
+
+        if frame != facelets.IDENTITY:
+            matrix = Matrix3x3([list(row) for row in facelets.inverse(frame)]) * matrix * Matrix3x3([list(row) for row in frame])
+
+        return matrix
+
+    def layer(self, face: str, depth: int, pieces: list=None) -> list:
+        # pieces in one slice, depth is the index along the face's axis
+        pieces = self.pieces if pieces is None else pieces
+        if face in ["F", "B"]:
+            layer = [pieces[depth][i][j] for i in range(self.layers) for j in range(self.layers)]
+
+        elif face in ["R", "L"]:
+            layer = [pieces[i][j][depth] for i in range(self.layers) for j in range(self.layers)]
+
+        else:
+            layer = [pieces[i][depth][j] for i in range(self.layers) for j in range(self.layers)]
+
+        return [piece for piece in layer if piece is not None]
 
     def handle_movement(self) -> None:
         while self.running:
-            if self.moving_threads:
-                # execute each enqueued movement thread synchronously independent of main thread to stop display freezing
-                thread = self.moving_threads.pop(0)
-                thread.start()
-                thread.join()
+            if not self.moving_queue:
+                # wait for a movement rather than spinning, waking now and then to see if the cube was closed
+                self.queued.wait(0.1)
+                self.queued.clear()
+
+            else:
+                # play queued movements in order, independent of the main thread to stop display freezing
+                self.moving = True
+                target, args = self.moving_queue.pop(0)
+                if target == self.rotate_pieces:
+                    # turns of different layers on one axis share no pieces, so they are played together
+                    turns = [args]
+                    while self.moving_queue and self.moving_queue[0][0] == self.rotate_pieces and self.commutes(turns, self.moving_queue[0][1]):
+                        turns.append(self.moving_queue.pop(0)[1])
+
+                    args = (turns,)
+
+                target(*args)
+                self.moving = False
+
+    def commutes(self, turns: list, turn: tuple) -> bool:
+        face, depth = turn[:2]
+        axis = facelets.QUARTER_TURNS[face][1]
+        return all(facelets.QUARTER_TURNS[other][1] == axis and other_depth != depth for other, other_depth, *_ in turns)
+
+    def update_history(self, face: str, depth: int, move: Move=None) -> None:
+        if move is not None:
+            # wide moves, slices and rotations are recorded as they were made
+            self.history.append(move)
+            self.history_index += 1
+            return
 
-    def update_history(self, face: str, depth: int) -> None:
         if depth == self.layers - 1:
             if face in ["F", "D", "L"]:
                 current_move_text = self.opposite_faces[face] + "'"
@@ -782,42 +1261,50 @@ class RubiksCube:
         self.history.append(Move.from_str(current_move_text))
         self.history_index += 1
 
-    def rotate_pieces(self, face: str, depth: int, steps: int, pieces: list, history: bool) -> None:
-        # rotate pieces in scene
-        if self.duration == 0:
-            steps = 1
-
-        if history:
-            self.update_history(face, depth)
-
-        self.moving = True
-
-        angle = 90/steps
-        for _ in range(steps):
-            if face == "F":
-                [pieces[depth][i][j].rotate(rot_z(angle)) for i in range(self.layers) for j in range(self.layers) if pieces[depth][i][j] is not None]
+    def rotate_pieces(self, turns: list) -> None:
+        # rotate pieces in scene, each turn is (face, depth, pieces, history, record, frame, deadline)
+        for face, depth, _, history, record, _, _ in turns:
+            if history:
+                self.update_history(face, depth, record)
 
-            elif face == "B":
-                [pieces[depth][i][j].rotate(rot_z(-angle)) for i in range(self.layers) for j in range(self.layers) if pieces[depth][i][j] is not None]
+        # every frame turns the slices from where they started, so errors don't build up between frames
+        layers = [
+            (face, frame, [(piece, piece.copy()) for piece in self.layer(face, depth, pieces)])
+            for face, depth, pieces, _, _, frame, _ in turns
+        ]
+        pieces = turns[-1][2]
 
-            elif face == "R":
-                [pieces[i][j][depth].rotate(rot_x(-angle)) for i in range(self.layers) for j in range(self.layers) if pieces[i][j][depth] is not None]
+        # axis and index of the slices being turned, so they can be drawn apart from the rest of the cube
+        self.turning = tuple((facelets.QUARTER_TURNS[face][1], depth) for face, depth, *_ in turns)
 
-            elif face == "L":
-                [pieces[i][j][depth].rotate(rot_x(angle)) for i in range(self.layers) for j in range(self.layers) if pieces[i][j][depth] is not None]
+        # share the latency allowed between these turns and the ones queued behind them and finish before the first is
+        # max_latency old, turns too short to see are made at once
+        start = time.perf_counter()
+        duration = min(self.duration / 1000, self.max_latency / 1000 / (len(self.moving_queue) + 1), turns[0][6] - start)
+        angle = 0
+        while angle < 90:
+            angle = 90 if duration < FRAME_TIME else min(90 * (time.perf_counter() - start) / duration, 90)
 
-            elif face == "U":
-                [pieces[i][depth][j].rotate(rot_y(-angle)) for i in range(self.layers) for j in range(self.layers) if pieces[i][depth][j] is not None]
+            # only the turning slices get new transforms, every other piece is shared with the last frame
+            for face, frame, layer in layers:
+                matrix = self.layer_matrix(face, angle, frame)
+                for piece, base in layer:
+                    turned = base.rotated(matrix)
+                    piece.matrix, piece.offset = turned.matrix, turned.offset
+                    self.shown[piece] = turned
 
-            elif face == "D":
-                [pieces[i][depth][j].rotate(rot_y(angle)) for i in range(self.layers) for j in range(self.layers) if pieces[i][depth][j] is not None]
+            self.tmp_pieces = [[[self.shown[piece] if piece is not None else None for piece in y] for y in z] for z in pieces]
 
-            self.tmp_pieces = [[[piece.copy() if piece is not None else None for piece in y] for y in z] for z in pieces]
+            if angle < 90:
+                time.sleep(self.frame_time)
 
-            if self.duration != 0:
-                time.sleep(self.duration / steps / 1000)
+        self.turning = ()
 
-        self.moving = False
+    def publish(self) -> None:
+        # frame of pieces for drawing, the transforms in it are never changed so it can be read while moves are made
+        self.shown = {piece: piece.copy() for z in self.pieces for y in z for piece in y if piece is not None}
+        self.turning = ()
+        self.tmp_pieces = [[[self.shown[piece] if piece is not None else None for piece in y] for y in z] for z in self.pieces]
 
     def scramble(self) -> None:
         # Make random moves on the cube
@@ -829,11 +1316,78 @@ class RubiksCube:
             move = Move(face, turns, depth)
             self.rotate(move, True)
 
+    def snapshot(self) -> tuple:
+        # where every piece is with its rotation and orientation, and the cube's frame
+        pieces = tuple(piece for z in self.pieces for y in z for piece in y)
+        states = tuple(None if piece is None else (search.ROTATION_INDEX[piece.rotation], piece.orient) for piece in pieces)
+        return pieces, states, self.frame
+
+    def restore(self, snapshot: tuple) -> None:
+        pieces, states, self.frame = snapshot
+        n = self.layers
+        self.pieces = [[[pieces[(z * n + y) * n + x] for x in range(n)] for y in range(n)] for z in range(n)]
+        for piece, state in zip(pieces, states):
+            if piece is not None:
+                piece.rotation = search.ROTATIONS[state[0]]
+                piece.orient = state[1]
+
+    def checkpoint(self, index: int=None) -> None:
+        # save the state if it is at a multiple of CHECKPOINT_INTERVAL moves, the current point in the history by default
+        index = self.history_index if index is None else index
+        if not index % CHECKPOINT_INTERVAL and index not in self.checkpoints:
+            self.checkpoints[index] = self.snapshot()
+
+    def record_checkpoint(self) -> None:
+        # called as each move is made for the history, the pieces are already where the move leaves them even when
+        # update_history only runs once the move is shown, by which time later moves may have been made too
+        self.recorded_index += 1
+        self.checkpoint(self.recorded_index)
+
+    def jump(self, index: int) -> None:
+        # go straight to a point in the history from the closest saved state, moving the pieces without animating
+        index = max(0, min(index, len(self.history) - 1))
+        while self.running and (self.moving or self.moving_queue):
+            time.sleep(0.001)
+
+        # how each mesh is turned from its solved position, instant rotations still waiting are left out
+        pieces = [piece for z in self.pieces for y in z for piece in y if piece is not None]
+        shown = [
+            facelets.compose(facelets.inverse(facelets.exact(piece.instant_matrix)), facelets.compose(facelets.inverse(self.frame), piece.rotation))
+            for piece in pieces
+        ]
+
+        self.recorded_index = len(self.history) - 1
+        self.checkpoint()
+        start = min([self.history_index, *self.checkpoints], key=lambda i: abs(i - index))
+        if start != self.history_index:
+            self.restore(self.checkpoints[start])
+            self.history_index = start
+
+        while self.history_index != index:
+            if self.history_index < index:
+                self.history_index += 1
+                self.rotate(self.history[self.history_index], False, False)
+
+            else:
+                self.rotate(self.history[self.history_index].opposite, False, False)
+                self.history_index -= 1
+
+            self.checkpoint()
+
+        # turn each mesh by the difference in one go
+        for piece, rotation in zip(pieces, shown):
+            target = facelets.compose(facelets.inverse(self.frame), piece.rotation)
+            piece.rotate(Matrix3x3([list(row) for row in facelets.compose(target, facelets.inverse(rotation))]))
+            piece.instant_matrix = Matrix3x3([[1, 0, 0], [0, 1, 0], [0, 0, 1]])
+
+        self.view_frame = Matrix3x3([list(row) for row in self.frame])
+        self.publish()
+
     def save_state(self, global_rotation: Matrix3x3) -> str:
         state = str(self.width) + ":" + str(self.layers) + ":"
         state += str(self.duration) + ":"
         state += ",".join(str(x) for y in global_rotation.data for x in y)
-        state += ":" + ",".join(map(str, self.history[1:])) + ":"
+        state += ":" + self.history.to_bytes().hex() + ":"
         return state + str(self.history_index)
 
     @classmethod
@@ -841,27 +1395,182 @@ class RubiksCube:
         state = state.split(":")
         obj = cls(int(state[0]), int(state[1]), int(state[2]))
         rotation = [float(i) for i in state[3].split(",")]
-        moves = [i for i in state[4].split(",") if i.strip()]
-        for move in moves:
-            obj.history.append(Move.from_str(move))
-
-        index = int(state[5])
-        while obj.history_index < index:
-            obj.history_index += 1
-            move = obj.history[obj.history_index]
-            obj.rotate(move, False, False)
-
-        # apply combined rotation matrices stored for each piece
-        for i in range(obj.layers):
-            for j in range(obj.layers):
-                for k in range(obj.layers):
-                    if obj.pieces[i][j][k] is not None:
-                        obj.pieces[i][j][k].rotate(obj.pieces[i][j][k].instant_matrix)
-                        obj.pieces[i][j][k].instant_matrix = Matrix3x3([[1, 0, 0], [0, 1, 0], [0, 0, 1]])
+        if state[4] and set(state[4]) <= set("0123456789abcdef"):
+            obj.history = History.from_bytes(bytes.fromhex(state[4]))
 
+        else:
+            # older saves list the moves
+            for move in state[4].split(","):
+                if move.strip():
+                    obj.history.append(Move.from_str(move))
+
+        # pass the whole history once so every point in it has a checkpoint close by
+        obj.jump(len(obj.history) - 1)
+        obj.jump(int(state[5]))
         return obj, Matrix3x3([rotation[:3], rotation[3:6], rotation[6:]])
 
-    def solve(self) -> None:
+    def to_facelets(self) -> str:
+        # 6N² character facelet string in U, R, F, D, L, B order
+        lookup = facelets.index(self.layers)
+        state = [""] * (6 * self.layers ** 2)
+        for z, z_row in enumerate(self.pieces):
+            for y, y_row in enumerate(z_row):
+                for x, piece in enumerate(y_row):
+                    if piece is None:
+                        continue
+
+                    for col in piece.cols:
+                        face = self.colour_faces[col]
+                        normal = facelets.transform(piece.rotation, facelets.NORMALS[face])
+                        state[lookup[((x, y, z), normal)]] = face
+
+        return "".join(state)
+
+    @classmethod
+    def from_facelets(cls, state: str, width: float=12, turn_duration: float=125) -> object:
+        # build a cube directly from a facelet string, raises ValueError for unsolvable states
+        layers, placed = facelets.parse(state)
+        obj = cls(width, layers, turn_duration)
+        homes = {(x, y, z): piece for z, z_row in enumerate(obj.pieces) for y, y_row in enumerate(z_row) for x, piece in enumerate(y_row)}
+
+        for (x, y, z), home, rotation in placed:
+            piece = homes[home]
+            piece.rotation = rotation
+            piece.rotate(Matrix3x3([list(row) for row in rotation]))
+
+            normals = [facelets.NORMALS[obj.colour_faces[col]] for col in piece.cols]
+            if isinstance(piece, Corner):
+                piece.orient = facelets.corner_orient(rotation, normals)
+
+            elif isinstance(piece, Edge):
+                piece.orient = facelets.edge_orient(rotation, normals)
+
+            obj.pieces[z][y][x] = piece
+
+        # the history starts from the imported state, not from the solved cube saved when it was made
+        obj.checkpoints = {}
+        obj.recorded_index = 0
+        obj.checkpoint()
+
+        obj.publish()
+        return obj
+
+    @property
+    def move_count(self) -> dict:
+        # moves made so far, counted in each metric
+        return count_moves(self.history[1:self.history_index + 1], self.layers)
+
+    def solve(self, metric: str="htm") -> None:
+        if self.layers not in [2, 3]:
+            return
+
+        # play the solution back tuned to the metric
+        for move in simplify(self.solution(metric=metric), self.layers, metric):
+            self.rotate(move, self.animate)
+
+    @property
+    def piece_state(self) -> dict:
+        # rotation of every piece, keyed by where it belongs
+        state = {}
+        for z, z_row in enumerate(self.pieces):
+            for y, y_row in enumerate(z_row):
+                for x, piece in enumerate(y_row):
+                    if piece is not None:
+                        rotation = search.ROTATION_INDEX[piece.rotation]
+                        state[search.slot((x, y, z), search.INVERSE[rotation], self.layers)] = rotation
+
+        return state
+
+    def solution(self, state: str=None, metric: str="htm") -> list:
+        # moves solving the cube, or another facelet string, worked out on unanimated copies. The solver always builds
+        # the white face first, so it is also run with the colours relabelled to start from each other face, and the
+        # solution cheapest in the metric is kept
+        state = self.to_facelets() if state is None else state
+        solved = "".join(face * self.layers ** 2 for face in facelets.FACES)
+        best = None
+        for rotations in cube_rotations()[::4]:
+            # colour each sticker after the face its colour is turned to, so solving this solves the cube held turned
+            turned = turn_facelets(solved, rotations, self.layers)
+            relabel = {turned[i * self.layers ** 2]: face for i, face in enumerate(facelets.FACES)}
+            solver = self.__class__.from_facelets("".join(relabel[face] for face in turn_facelets(state, rotations, self.layers)), self.width, 0)
+            solver.running = False
+            solver.animate = False
+            solver.solve_in_place()
+
+            # held the usual way up again at the end, so the cube counts as solved
+            moves = list(rotations) + solver.history[1:]
+            end = turn_facelets(state, moves, self.layers)
+            moves += [spin for spin in cube_rotations() if turn_facelets(end, spin, self.layers) == solved][0]
+            cost = count_moves(simplify(moves, self.layers, metric), self.layers)[metric]
+            if best is None or cost < best[0]:
+                best = (cost, moves)
+
+        return best[1]
+
+    def solve_to(self, target, metric: str="htm", max_depth: int=12, max_states: int=1500000) -> list:
+        # shortest route to another cube or facelet string, searching from both ends to meet in the middle, when they are
+        # too far apart the solver is run on this cube relabelled so the target looks solved
+        layers = self.layers
+        if isinstance(target, str):
+            size, placed = facelets.parse(target)
+            state = {home: search.ROTATION_INDEX[rotation] for _, home, rotation in placed}
+            target = "".join(target.split()).upper()
+
+        else:
+            size, state, target = target.layers, target.piece_state, target.to_facelets()
+
+        if size != layers:
+            raise ValueError(f"can't turn a {layers}x{layers} cube into a {size}x{size} cube")
+
+        path = search.meet(layers, self.piece_state, state, metric == "qtm", max_depth, max_states)
+        if path is not None:
+            moves = [Move(*move) for move in path]
+
+        elif layers in [2, 3]:
+            # moves solving A·B⁻¹ take A to B
+            moves = self.solution(search.facelet_string(layers, search.relative(layers, self.piece_state, state)), metric)
+
+        else:
+            raise ValueError(f"cubes are more than {max_depth} moves apart")
+
+        # the target may be held a different way up
+        end = turn_facelets(self.to_facelets(), moves, layers)
+        moves += [rotations for rotations in cube_rotations() if turn_facelets(end, rotations, layers) == target][0]
+
+        moves = simplify(moves, layers, metric)
+        for move in moves:
+            self.rotate(move, self.animate)
+
+        return moves
+
+    def solve_goal(self, goal, metric: str="htm", processes: int=1) -> list:
+        # fastest route to part of the cube, goal is a preset name, a facelet mask or a list of pieces
+        layers = self.layers
+        state = self.piece_state
+
+        if isinstance(goal, str) and len("".join(goal.split())) == 6 * layers ** 2:
+            # any character that isn't a face letter in the mask matches every colour
+            stages = [(search.sticker_goal(layers, goal), None)]
+
+        elif isinstance(goal, str):
+            stages = search.preset(layers, goal, state)
+
+        else:
+            # pieces are given by their face letters ("DF", "DFR") or their solved grid position
+            frame = search.reference(layers, state)
+            stages = [({
+                home: search.placed(layers, home, frame) for piece in goal for home in search.pieces(layers)
+                if (home == tuple(piece) if not isinstance(piece, str) else set(search.faces(home, layers)) == set(piece.upper()))
+            }, None)]
+
+        costs = tuple(move_cost(Move(*move), layers, metric) for move in search.moves(layers))
+        moves = simplify([Move(*move) for move in search.solve_stages(layers, state, stages, costs, processes)], layers, metric)
+        for move in moves:
+            self.rotate(move, self.animate)
+
+        return moves
+
+    def solve_in_place(self) -> None:
         if self.layers == 2:
             # 2x2 cube
 
@@ -1074,31 +1783,32 @@ class RubiksCube:
 
             # re-orient centers
             # centers cannot turn relatively, aligning two aligns them all
+            # whole cube rotations only change the frame, so they cost no moves
             if self.pieces[1][2][1].col != self.white:
                 if self.pieces[0][1][1].col == self.white:
-                    self.evaluate("R.1")
+                    self.evaluate("x")
 
                 elif self.pieces[2][1][1].col == self.white:
-                    self.evaluate("L.1")
+                    self.evaluate("x'")
 
                 elif self.pieces[1][1][0].col == self.white:
-                    self.evaluate("F.1")
+                    self.evaluate("z")
 
                 elif self.pieces[1][1][2].col == self.white:
-                    self.evaluate("B.1")
+                    self.evaluate("z'")
 
                 else:
-                    self.evaluate("F2.1")
+                    self.evaluate("z2")
 
             if self.pieces[0][1][1].col != self.red:
                 if self.pieces[1][1][2].col == self.red:
-                    self.evaluate("U.1")
+                    self.evaluate("y")
 
                 elif self.pieces[1][1][0].col == self.red:
-                    self.evaluate("D.1")
+                    self.evaluate("y'")
 
                 else:
-                    self.evaluate("U2.1")
+                    self.evaluate("y2")
 
             # construct white cross
             for z, z_row in enumerate(self.pieces):
@@ -1559,149 +2269,28 @@ class RubiksCube:
                                 self.evaluate("R D' R' D' B' D B D' R D' R' D' B' D B")
 
 
-            # align bottom edges
-            if self.pieces[2][0][1].col2 == self.red:
-                self.evaluate("D2")
-
-            elif self.pieces[1][0][0].col2 == self.red:
-                self.evaluate("D")
-
-            elif self.pieces[1][0][2].col2 == self.red:
-                self.evaluate("D'")
-
-            if self.pieces[2][0][1].col2 == self.green:
-                self.evaluate("B D2 B' D' B D' B' D'")
-
-            elif self.pieces[1][0][2].col2 == self.green:
-                self.evaluate("F D2 F' D' F D' F' D2")
-
-            if self.pieces[2][0][1].col2 == self.blue:
-                self.evaluate("R D2 R' D' R D' R' D'")
-
-            # rotate bottom edges properly
-            if self.pieces[0][0][1].orient == 1:
-                if self.pieces[1][0][0].orient == 1:
-                    self.evaluate("L R' F L' R U' L R' F2 L' R D L R' F2 L' R U L R' F' L' R D'")
-
-                elif self.pieces[1][0][2].orient == 1:
-                    self.evaluate("L R' F L' R U' L R' F2 L' R D' L R' F2 L' R U L R' F' L' R D")
-
-                elif self.pieces[2][0][1].orient == 1:
-                    self.evaluate("L R' F L' R U' L R' F2 L' R D2 L R' F2 L' R U L R' F' L' R D2")
-
-            if self.pieces[1][0][0].orient == 1:
-                if self.pieces[1][0][2].orient == 1:
-                    self.evaluate("D L R' F L' R U' L R' F2 L' R D2 L R' F2 L' R U L R' F' L' R D")
-
-                elif self.pieces[2][0][1].orient == 1:
-                    self.evaluate("D L R' F L' R U' L R' F2 L' R D L R' F2 L' R U L R' F' L' R D2")
-
-            if self.pieces[2][0][1].orient == 1:
-                self.evaluate("D2 L R' F L' R U' L R' F2 L' R D L R' F2 L' R U L R' F' L' R D")
-
-            # align bottom corners
-            if not (self.pieces[0][0][0].col2 == self.red or self.pieces[0][0][2].col2 == self.blue or self.pieces[2][0][2].col2 == self.orange or self.pieces[2][0][0].col2 == self.green):
-                # no corners in correct positions
-                if self.pieces[2][0][0].col2 == self.red:
-                    self.evaluate("R' D L D' R D L' D'")
-
-                elif self.pieces[2][0][2].col2 == self.red:
-                    self.evaluate("R' D L D' R D L' D' R' D L D' R D L' D'")
-
-                else:
-                    self.evaluate("D L D' R' D L' D' R")
-
-            if self.pieces[0][0][0].col2 == self.red:
-                if self.pieces[2][0][0].col2 == self.blue:
-                    self.evaluate("R' D L D' R D L' D'")
-
-                elif self.pieces[0][0][2].col2 == self.green:
-                    self.evaluate("D L D' R' D L' D' R")
-
-            elif self.pieces[0][0][2].col2 == self.blue:
-                if self.pieces[0][0][0].col2 == self.orange:
-                    self.evaluate("B' D F D' B D F' D'")
-
-                elif self.pieces[0][0][0].col2 == self.green:
-                    self.evaluate("D F D' B' D F' D' B")
-
-            elif self.pieces[2][0][2].col2 == self.orange:
-                if self.pieces[0][0][2].col2 == self.green:
-                    self.evaluate("L' D R D' L D R' D'")
-
-                elif self.pieces[2][0][0].col2 == self.blue:
-                    self.evaluate("D R D' L' D R' D' L")
-
-            elif self.pieces[2][0][0].col2 == self.green:
-                if self.pieces[2][0][2].col2 == self.red:
-                    self.evaluate("F' D B D' F D B' D'")
-
-                elif self.pieces[0][0][0].col2 == self.orange:
-                    self.evaluate("D B D' F' D B' D' F")
-
-            for _ in range(4):
-                if self.solved:
+            # last layer, each step is one table lookup once the layer is turned to match a known case
+            for step in ["oll", "pll"]:
+                cases = last_layer_cases(step)
+                state = self.to_facelets()
+                for turns in range(4):
+                    key = last_layer_key(turn_facelets(state, [Move("D", turns)] if turns else [], 3), step)
+                    if key in cases:
+                        self.evaluate((str(Move("D", turns)) if turns else "") + " " + cases[key])
+                        break
+
+            # line the last layer up with the centers
+            for _ in range(3):
+                state = self.to_facelets()
+                if all(len(set(state[i:i + 9])) == 1 for i in range(0, 54, 9)):
                     break
 
                 self.evaluate("D")
 
-                if self.pieces[0][0][0].orient == 1:
-                    if self.pieces[0][0][2].orient == 2:
-                        self.evaluate("L' U L U' L' U L D' L' U' L U L' U' L D")
-
-                    elif self.pieces[2][0][0].orient == 2:
-                        self.evaluate("L' U L U' L' U L D L' U' L U L' U' L D'")
-
-                    elif self.pieces[2][0][2].orient == 2:
-                        self.evaluate("L' U L U' L' U L D2 L' U' L U L' U' L D2")
-
-                    elif self.pieces[0][0][2].orient == 0:
-                        self.evaluate("L' U L U' L' U L D L' U' L U L' U2 L U L' U' L D L' U L U' L' U L D2")
-
-                    elif self.pieces[2][0][0].orient == 0:
-                        self.evaluate("L' U L U' L' U L D' L' U' L U L' U2 L U L' U' L D' L' U L U' L' U L D2")
-
-                    elif self.pieces[2][0][2].orient == 0:
-                        self.evaluate("D' L' U L U' L' U L D L' U' L U L' U2 L U L' U' L D L' U L U' L' U L D'")
-
-                if self.pieces[0][0][0].orient == 2:
-                    if self.pieces[0][0][2].orient == 1:
-                        self.evaluate("L' U' L U L' U' L D' L' U L U' L' U L D")
-
-                    elif self.pieces[2][0][0].orient == 1:
-                        self.evaluate("L' U' L U L' U' L D L' U L U' L' U L D'")
-
-                    elif self.pieces[2][0][2].orient == 1:
-                        self.evaluate("L' U' L U L' U' L D2 L' U L U' L' U L D2")
-
-                    elif self.pieces[0][0][2].orient == 0:
-                        self.evaluate("L' U' L U L' U' L D L' U L U' L' U2 L U' L' U L D L' U' L U L' U' L D2")
-
-                    elif self.pieces[2][0][0].orient == 0:
-                        self.evaluate("L' U' L U L' U' L D' L' U L U' L' U2 L U' L' U L D' L' U' L U L' U' L D2")
-
-                    elif self.pieces[2][0][2].orient == 0:
-                        self.evaluate("D' L' U' L U L' U' L D L' U L U' L' U2 L U' L' U L D L' U' L U L' U' L D'")
-
     def evaluate(self, sequence: str) -> None:
-        str_moves = sequence.upper().split(" ")
-        moves = []
-        for move in str_moves:
-            depth = 0
-            if "." in move:
-                move, depth = move.split(".")
-                depth = int(depth)
-
-            if move in ["F", "B", "R", "L", "U", "D"]:
-                moves.append(Move(move, 1, depth))
-
-            elif move.endswith("'") and move[:-1] in ["F", "B", "R", "L", "U", "D"]:
-                moves.append(Move(move[:-1], 3, depth))
-
-            elif move.endswith("2") and move[:-1] in ["F", "B", "R", "L", "U", "D"]:
-                moves.append(Move(move[:-1], 2, depth))
-
-            # quietly discard invalid moves
+        moves = [Move.from_str(move) for move in sequence.split()]
 
+        # quietly discard invalid moves
         for move in moves:
-            self.rotate(move)
+            if move is not None:
+                self.rotate(move, self.animate)
@@ -0,0 +1,237 @@
+from math3d import rot_x, rot_y, rot_z
+import functools, math
+
+# faces in standard facelet string order
+FACES = "URFDLB"
+
+# outward normal of each face, x to the right, y upwards and z away from the front face
+NORMALS = {
+    "U": (0, 1, 0),
+    "R": (1, 0, 0),
+    "F": (0, 0, -1),
+    "D": (0, -1, 0),
+    "L": (-1, 0, 0),
+    "B": (0, 0, 1)
+}
+
+IDENTITY = ((1, 0, 0), (0, 1, 0), (0, 0, 1))
+
+
+def exact(matrix) -> tuple:
+    # remove floating point error from rotation matrices that are multiples of 90 degrees
+    return tuple(tuple(round(value) for value in row) for row in matrix.data)
+
+
+def transform(matrix: tuple, vec: tuple) -> tuple:
+    return tuple(sum(matrix[i][k] * vec[k] for k in range(3)) for i in range(3))
+
+
+def compose(a: tuple, b: tuple) -> tuple:
+    # matrix product a * b, applying b first
+    return tuple(tuple(sum(a[i][k] * b[k][j] for k in range(3)) for j in range(3)) for i in range(3))
+
+
+def inverse(matrix: tuple) -> tuple:
+    # rotation matrices are orthogonal
+    return tuple(zip(*matrix))
+
+
+# clockwise quarter turn of each face: rotation matrix, axis and whether depth counts from the far side
+QUARTER_TURNS = {
+    "F": (exact(rot_z(90)), 2, False),
+    "B": (exact(rot_z(-90)), 2, True),
+    "R": (exact(rot_x(-90)), 0, True),
+    "L": (exact(rot_x(90)), 0, False),
+    "U": (exact(rot_y(-90)), 1, True),
+    "D": (exact(rot_y(90)), 1, False)
+}
+
+# all 24 orientations of a cube
+ROTATIONS = [IDENTITY]
+for rotation in ROTATIONS:
+    for matrix, _, _ in QUARTER_TURNS.values():
+        if (new := compose(matrix, rotation)) not in ROTATIONS:
+            ROTATIONS.append(new)
+
+
+@functools.lru_cache(maxsize=None)
+def layout(layers: int) -> tuple:
+    # grid position (x, y, z) and outward normal of every facelet, in facelet string order
+    n = layers - 1
+    stickers = []
+    for face in FACES:
+        for row in range(layers):
+            for col in range(layers):
+                if face == "U":
+                    pos = (col, n, n - row)
+
+                elif face == "R":
+                    pos = (n, n - row, col)
+
+                elif face == "F":
+                    pos = (col, n - row, 0)
+
+                elif face == "D":
+                    pos = (col, 0, row)
+
+                elif face == "L":
+                    pos = (0, n - row, n - col)
+
+                else:
+                    pos = (n - col, n - row, n)
+
+                stickers.append((pos, NORMALS[face]))
+
+    return tuple(stickers)
+
+
+@functools.lru_cache(maxsize=None)
+def index(layers: int) -> dict:
+    # reverse lookup of layout, (position, normal) -> facelet index
+    return {sticker: i for i, sticker in enumerate(layout(layers))}
+
+
+def solved_state(layers: int) -> list:
+    # every facelet holds the index of the face it belongs to
+    return [i // layers ** 2 for i in range(6 * layers ** 2)]
+
+
+@functools.lru_cache(maxsize=None)
+def permutation(layers: int, face: str, turns: int=1, depth: int=0) -> tuple:
+    # facelet permutation of a move, new_state[i] = old_state[perm[i]]
+    if depth >= layers:
+        # if depth to large rotate the first piece
+        depth = 0
+
+    matrix, axis, far_side = QUARTER_TURNS[face]
+    layer = layers - depth - 1 if far_side else depth
+
+    lookup = index(layers)
+    perm = list(range(6 * layers ** 2))
+    for i, (pos, normal) in enumerate(layout(layers)):
+        if pos[axis] != layer:
+            continue
+
+        # rotate around the cube center, grid positions are doubled to keep them integers
+        doubled = tuple(2 * v - layers + 1 for v in pos)
+        for _ in range(turns % 4):
+            doubled = transform(matrix, doubled)
+            normal = transform(matrix, normal)
+
+        new_pos = tuple((v + layers - 1) // 2 for v in doubled)
+        perm[lookup[(new_pos, normal)]] = i
+
+    return tuple(perm)
+
+
+def corner_orient(rotation: tuple, normals: list) -> int:
+    # normals of the top, front and right stickers before the piece was moved
+    k = [i for i, normal in enumerate(normals) if transform(rotation, normal)[1]][0]
+    return (3 - k) % 3
+
+
+def edge_orient(rotation: tuple, normals: list) -> int:
+    # 0 and 1 for edges lying flat, 2 and 3 for upright edges, odd values are flipped
+    first, second = (transform(rotation, normal) for normal in normals)
+    if first[1]:
+        return 0
+
+    if not second[1]:
+        return 2 if first[0] else 3
+
+    return 1
+
+
+def parity(mapping: dict) -> int:
+    # parity of a permutation by counting its cycles
+    seen = set()
+    cycles = 0
+    for start in mapping:
+        if start in seen:
+            continue
+
+        cycles += 1
+        while start not in seen:
+            seen.add(start)
+            start = mapping[start]
+
+    return (len(mapping) - cycles) % 2
+
+
+def parse(state: str) -> tuple:
+    # find which piece sits in each position and how it is rotated, raising ValueError for impossible states
+    state = "".join(state.split()).upper()
+    layers = round(math.sqrt(len(state) / 6))
+    if layers < 2 or 6 * layers ** 2 != len(state):
+        raise ValueError(f"a facelet string needs 6N\u00b2 facelets, got {len(state)}")
+
+    if set(state) - set(FACES):
+        raise ValueError(f"facelets must be one of {FACES}")
+
+    for face in FACES:
+        if state.count(face) != layers ** 2:
+            raise ValueError(f"expected {layers ** 2} {face} facelets, got {state.count(face)}")
+
+    slots = {}
+    for (pos, normal), face in zip(layout(layers), state):
+        slots.setdefault(pos, []).append((normal, face))
+
+    placed = []
+    used = {}
+    for slot, stickers in slots.items():
+        doubled = tuple(2 * v - layers + 1 for v in slot)
+        found = None
+        for rotation in ROTATIONS:
+            # every colour has to be turned from its own face to where it was scanned
+            if any(transform(rotation, NORMALS[face]) != normal for normal, face in stickers):
+                continue
+
+            home = tuple((v + layers - 1) // 2 for v in transform(inverse(rotation), doubled))
+            found = home
+            if home not in used:
+                break
+
+        else:
+            colours = "".join(face for _, face in stickers)
+            if found is None:
+                raise ValueError(f"no piece has colours {colours} at {slot}")
+
+            raise ValueError(f"piece {colours} appears more than once")
+
+        used[home] = slot
+        placed.append((slot, home, rotation))
+
+    middle = layers // 2 if layers % 2 else None
+    twist = 0
+    flip = 0
+    corners = {}
+    midges = {}
+    centers = {}
+    for slot, home, rotation in placed:
+        sides = len(slots[slot])
+        if sides == 3:
+            # order the stickers like the corner meshes: top, front, right
+            up = (0, 1 if home[1] else -1, 0)
+            a, b = [normal for normal, _ in slots[home] if not normal[1]]
+            cross = (up[1] * a[2], 0, -up[1] * a[0])
+            twist += corner_orient(rotation, [up, a, b] if cross == tuple(-v for v in b) else [up, b, a])
+            corners[slot] = home
+
+        elif sides == 2 and middle in slot:
+            normals = sorted((normal for normal, _ in slots[home]), key=lambda n: (not n[1], not n[0]))
+            flip += edge_orient(rotation, normals) % 2
+            midges[slot] = home
+
+        elif sides == 1 and slot.count(middle) == 2:
+            centers[slot] = home
+
+    if twist % 3:
+        raise ValueError("corner twist does not add up, a corner is twisted")
+
+    if flip % 2:
+        raise ValueError("edge orientation parity is odd, an edge is flipped")
+
+    if layers % 2 and parity(corners) ^ parity(midges) ^ parity(centers):
+        raise ValueError("permutation parity is odd, two pieces are swapped")
+
+    return layers, placed
@@ -0,0 +1,43 @@
+class Governor:
+    # ways of making frames cheaper to draw, each level turns off one more of them
+    LEVELS = ("full", "no backfaces", "fewer animation frames", "no outlines")
+
+    def __init__(self, budget: float, window: int=10, headroom: float=0.5):
+        # quality is stepped down when frames average over the budget in seconds, and back up once they average under
+        # headroom times the budget, looked at every window frames so single slow frames don't change it
+        self.budget = budget
+        self.window = window
+        self.headroom = headroom
+        self.level = 0
+        self.times = []
+
+    def update(self, frame_time: float) -> None:
+        self.times.append(frame_time)
+        if len(self.times) < self.window:
+            return
+
+        average = sum(self.times) / len(self.times)
+        self.times = []
+        if average > self.budget and self.level < len(self.LEVELS) - 1:
+            self.level += 1
+
+        elif average < self.headroom * self.budget and self.level > 0:
+            self.level -= 1
+
+    @property
+    def backfaces(self) -> bool:
+        # insides of the cube shown in black while a slice turns
+        return self.level < 1
+
+    @property
+    def animation_frames(self) -> float:
+        # fraction of the usual animation frames to show for each turn
+        return 1 if self.level < 2 else 0.5
+
+    @property
+    def outlines(self) -> bool:
+        # black edges around each sticker, last to go as white stickers can't be seen against the background without them
+        return self.level < 3
+
+    def __repr__(self) -> str:
+        return self.LEVELS[self.level]
@@ -0,0 +1,118 @@
+from cube import RubiksCube
+import os, time
+
+
+class Journal:
+    def __init__(self, directory: str, sync_interval: float=1, compact_after: int=1000):
+        # moves are appended to the journal as they are made and folded into the snapshot every so often
+        self.directory = directory
+        self.snapshot_path = os.path.join(directory, "session.save")
+        self.journal_path = os.path.join(directory, "session.journal")
+        self.sync_interval = sync_interval
+        self.compact_after = compact_after
+
+        self.file = None
+        self.records = 0
+        self.unsynced = False
+        self.last_sync = time.time()
+
+        # cube, history length and history index last written for each size of cube
+        self.written = {}
+
+    def recover(self) -> list:
+        # cubes and view rotations from the last snapshot with the journal replayed on top, empty if there is no session
+        if not os.path.exists(self.snapshot_path):
+            return []
+
+        try:
+            with open(self.snapshot_path, "r") as fp:
+                found = [RubiksCube.load_state(line) for line in fp.read().split("\n") if line.strip()]
+
+        except (OSError, ValueError, IndexError):
+            return []
+
+        cubes = {cube.layers: cube for cube, _ in found}
+        indices = {}
+        if os.path.exists(self.journal_path):
+            with open(self.journal_path, "r") as fp:
+                for line in fp:
+                    if not line.endswith("\n"):
+                        # the last record may have been cut short by a crash
+                        break
+
+                    try:
+                        layers, start, index, codes = line.split(" ")
+                        cube = cubes[int(layers)]
+
+                        # moves made while the snapshot was written can be in both, only add the ones it's missing
+                        skip = len(cube.history) - int(start)
+                        if skip < 0:
+                            break
+
+                        cube.history.extend(bytes.fromhex(codes.strip())[2 * skip:])
+                        indices[cube] = int(index)
+
+                    except (ValueError, KeyError):
+                        break
+
+        for cube, index in indices.items():
+            cube.jump(index)
+
+        return found
+
+    def update(self, cubes: list, snapshot) -> None:
+        # record whatever changed in each cube's history since the last call, snapshot gives the text of a full save
+        if self.file is None or any(
+            cube.layers not in self.written or self.written[cube.layers][0] is not cube or len(cube.history) < self.written[cube.layers][1]
+            for cube in cubes
+        ):
+            # a cube was swapped out by loading a save, start again from a new snapshot
+            self.compact(cubes, snapshot)
+            return
+
+        for cube in cubes:
+            _, length, index = self.written[cube.layers]
+            new_length, new_index = len(cube.history), cube.history_index
+            if (new_length, new_index) != (length, index):
+                self.file.write(f"{cube.layers} {length} {new_index} {cube.history.to_bytes(length, new_length).hex()}\n")
+                self.written[cube.layers] = (cube, new_length, new_index)
+                self.records += 1
+                self.unsynced = True
+
+        if self.records >= self.compact_after:
+            self.compact(cubes, snapshot)
+
+        elif self.unsynced and time.time() - self.last_sync >= self.sync_interval:
+            self.sync()
+
+    def sync(self) -> None:
+        # records are forced to disk in batches instead of one at a time
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.unsynced = False
+        self.last_sync = time.time()
+
+    def compact(self, cubes: list, snapshot) -> None:
+        # write a full snapshot next to the old one, swap it in, then empty the journal
+        os.makedirs(self.directory, exist_ok=True)
+        written = {cube.layers: (cube, len(cube.history), cube.history_index) for cube in cubes}
+        with open(self.snapshot_path + ".tmp", "w") as fp:
+            fp.write(snapshot())
+            fp.flush()
+            os.fsync(fp.fileno())
+
+        os.replace(self.snapshot_path + ".tmp", self.snapshot_path)
+
+        if self.file is not None:
+            self.file.close()
+
+        self.file = open(self.journal_path, "w")
+        self.written = written
+        self.records = 0
+        self.unsynced = False
+        self.last_sync = time.time()
+
+    def close(self, cubes: list, snapshot) -> None:
+        self.compact(cubes, snapshot)
+        self.file.close()
+        self.file = None
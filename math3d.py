@@ -1,7 +1,9 @@
-import math
+import copy, functools, math
 
 
 class Matrix3x3:
+    __slots__ = ("data",)
+
     def __init__(self, rows: list=None):
         # generate empty matrix
         self.data = [[0, 0, 0] for _ in range(3)]
@@ -13,6 +15,15 @@ class Matrix3x3:
                 self.data = rows
 
     def __mul__(self, other):
+        if isinstance(other, Vector3):
+            # vectors are a single column
+            rows = self.data
+            return Vector3(
+                rows[0][0] * other.i + rows[0][1] * other.j + rows[0][2] * other.k,
+                rows[1][0] * other.i + rows[1][1] * other.j + rows[1][2] * other.k,
+                rows[2][0] * other.i + rows[2][1] * other.j + rows[2][2] * other.k
+            )
+
         if isinstance(other, self.__class__):
             new = other.__class__()
             for y in range(3):
@@ -37,6 +48,8 @@ class Matrix3x3:
 
 
 class Vector2:
+    __slots__ = ("i", "j")
+
     def __init__(self, i: float=0, j: float=0):
         try:
             assert isinstance(i, (int, float))
@@ -67,61 +80,43 @@ class Vector2:
 
 
 class Vector3(Matrix3x3):
+    # only the three components are stored, the matrix column is built when asked for
+    __slots__ = ("i", "j", "k")
+
     def __init__(self, i: float=0, j: float=0, k: float=0):
-        # Vectors are represented as matrices to allow easy matrix - vector multiplication
         try:
             # test that values entered are actually numbers, otherwise create a zero vector
             assert isinstance(i, (int, float))
             assert isinstance(j, (int, float))
             assert isinstance(k, (int, float))
-            self.data = [[i, 0, 0], [j, 0, 0], [k, 0, 0]]
+            self.i = i
+            self.j = j
+            self.k = k
 
         except AssertionError:
-            self.data = [[0, 0, 0] for _ in range(3)]
+            self.i = self.j = self.k = 0
+
+    def __mul__(self, other):
+        if isinstance(other, (int, float)):
+            return self.__class__(self.i * other, self.j * other, self.k * other)
+
+        return super().__mul__(other)
 
     def __add__(self, other):
         if isinstance(other, self.__class__):
-            new = self.__class__()
-            new.i = self.i + other.i
-            new.j = self.j + other.j
-            new.k = self.k + other.k
-            return new
+            return self.__class__(self.i + other.i, self.j + other.j, self.k + other.k)
 
         return NotImplemented
 
     def __sub__(self, other):
         if isinstance(other, self.__class__):
-            new = self.__class__()
-            new.i = self.i - other.i
-            new.j = self.j - other.j
-            new.k = self.k - other.k
-            return new
+            return self.__class__(self.i - other.i, self.j - other.j, self.k - other.k)
 
         return NotImplemented
 
     @property
-    def i(self):
-        return self.data[0][0]
-
-    @i.setter
-    def i(self, value):
-        self.data[0][0] = value
-
-    @property
-    def j(self):
-        return self.data[1][0]
-
-    @j.setter
-    def j(self, value):
-        self.data[1][0] = value
-
-    @property
-    def k(self):
-        return self.data[2][0]
-
-    @k.setter
-    def k(self, value):
-        self.data[2][0] = value
+    def data(self) -> list:
+        return [[self.i, 0, 0], [self.j, 0, 0], [self.k, 0, 0]]
 
     @property
     def magnitude(self):
@@ -134,57 +129,81 @@ class Vector3(Matrix3x3):
         except AttributeError:
             return 0
 
+    def cross(self, other: object) -> object:
+        return self.__class__(
+            self.j * other.k - self.k * other.j,
+            self.k * other.i - self.i * other.k,
+            self.i * other.j - self.j * other.i
+        )
+
     def copy(self) -> object:
         return self.__class__(self.i, self.j, self.k)
 
 
-class Triangle:
-    def __init__(self, p1: Vector3, p2: Vector3, p3: Vector3, col: str):
-        self.p1 = p1
-        self.p2 = p2
-        self.p3 = p3
+class Quad:
+    __slots__ = ("points", "col", "normal")
+
+    def __init__(self, p1: Vector3, p2: Vector3, p3: Vector3, p4: Vector3, col: str, normal: Vector3=None):
+        # corners in order around the quad, stickers are drawn as one quad instead of two triangles
+        self.points = (p1, p2, p3, p4)
         self.col = col
 
+        # meshes turn their stickers' normals with them, it is only worked out from the co-planar corners if not given
+        self.normal = (p2 - p1).cross(p3 - p1) if normal is None else normal
+
+
+class Mesh:
+    __slots__ = ("matrix", "offset")
+
+    # stickers in local space, each a quad given by its four corners, shared by every mesh of a type
+    shape = ()
+    normals = ()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        # outward normal of each sticker in local space, worked out once for each type of mesh
+        cls.normals = tuple((p2 - p1).cross(p3 - p1) for p1, p2, p3, _ in cls.shape)
 
-class Polygon:
-    def __init__(self, *triangles: Triangle):
-        self.triangles = list(triangles)
+    def __init__(self):
+        # points are placed by matrix * point + offset, only these change as the mesh is moved
+        self.matrix = Matrix3x3([[1, 0, 0], [0, 1, 0], [0, 0, 1]])
+        self.offset = Vector3()
 
     @property
-    def normal(self):
-        # assuming all triangles in the polygon are co-planar
-        u = self.triangles[0].p2 - self.triangles[0].p1
-        v = self.triangles[0].p3 - self.triangles[0].p1
-        new = Vector3()
-        new.i = u.j * v.k - u.k * v.j
-        new.j = u.k * v.i - u.i * v.k
-        new.k = u.i * v.j - u.j * v.i
-        return new
+    def cols(self) -> tuple:
+        # colour of each sticker in the shape
+        return ()
 
+    @property
+    def polys(self) -> list:
+        # stickers in world space, built from the shared shape when they are needed
+        return [self.sticker(i) for i in range(len(self.shape))]
 
-class Mesh:
-    polys = []
+    def sticker(self, i: int) -> Quad:
+        # one sticker in world space, its normal is turned by the matrix instead of worked out from its corners
+        return Quad(
+            *(self.matrix * point + self.offset for point in self.shape[i]), self.cols[i], self.matrix * self.normals[i]
+        )
 
     def scale(self, size: float) -> None:
-        for poly in self.polys:
-            for tri in poly.triangles:
-                tri.p1 *= size
-                tri.p2 *= size
-                tri.p3 *= size
+        # new matrices and vectors are made instead of changing them, copies of the mesh may still use them
+        self.matrix = self.matrix * size
+        self.offset = self.offset * size
 
     def translate(self, delta: Vector3) -> None:
-        for poly in self.polys:
-            for tri in poly.triangles:
-                tri.p1 += delta
-                tri.p2 += delta
-                tri.p3 += delta
+        self.offset = self.offset + delta
 
     def rotate(self, angle: Matrix3x3) -> None:
-        for poly in self.polys:
-            for tri in poly.triangles:
-                tri.p1 = angle * tri.p1
-                tri.p2 = angle * tri.p2
-                tri.p3 = angle * tri.p3
+        self.matrix = angle * self.matrix
+        self.offset = angle * self.offset
+
+    def rotated(self, angle: Matrix3x3) -> object:
+        new = self.copy()
+        new.rotate(angle)
+        return new
+
+    def copy(self) -> object:
+        return copy.copy(self)
 
 
 class Camera:
@@ -193,10 +212,26 @@ class Camera:
         self.rot = rot
         self.near_clip = near_clip
 
+    @property
+    def rot(self) -> Vector3:
+        return self._rot
+
+    @rot.setter
+    def rot(self, rot: Vector3) -> None:
+        # the view matrix is made again the next time it is used, so rotations have to be set rather than changed
+        self._rot = rot
+        self._view = None
+
+    @property
+    def view(self) -> Matrix3x3:
+        # rotation from world space into camera space, kept until the camera is turned
+        if self._view is None:
+            self._view = rot_x(self.rot.i) * rot_y(self.rot.j) * rot_z(self.rot.k)
+
+        return self._view
+
     def world_to_camera(self, point: Vector3) -> Vector3:
-        new = rot_x(self.rot.i) * rot_y(self.rot.j) * rot_z(self.rot.k)
-        new *= point - self.pos
-        return new
+        return self.view * (point - self.pos)
 
     def project2d(self, point: Vector3, width: int, height: int) -> Vector2:
         # convert 3D points to 2D: divide by z, map to screen
@@ -207,26 +242,41 @@ class Camera:
             )
 
 
-# matrices to rotate a point in 3D space
+@functools.lru_cache(maxsize=1024)
+def trig(deg: float) -> tuple:
+    # cosine and sine of an angle in degrees
+    rad = math.radians(deg)
+    return math.cos(rad), math.sin(rad)
+
+
+# matrices to rotate a point in 3D space, the same angles come up again and again from moves and dragging so the
+# matrices are shared between callers and must not be changed in place
+@functools.lru_cache(maxsize=1024)
 def rot_x(deg: float) -> Matrix3x3:
+    cos, sin = trig(deg)
     return Matrix3x3([
         [1, 0, 0],
-        [0, math.cos(math.radians(deg)), math.sin(math.radians(deg))],
-        [0, -math.sin(math.radians(deg)), math.cos(math.radians(deg))]
+        [0, cos, sin],
+        [0, -sin, cos]
     ])
 
 
+@functools.lru_cache(maxsize=1024)
 def rot_y(deg: float) -> Matrix3x3:
+    cos, sin = trig(deg)
     return Matrix3x3([
-        [math.cos(math.radians(deg)), 0, -math.sin(math.radians(deg))],
+        [cos, 0, -sin],
         [0, 1, 0],
-        [math.sin(math.radians(deg)), 0, math.cos(math.radians(deg))]
+        [sin, 0, cos]
     ])
 
 
+@functools.lru_cache(maxsize=1024)
 def rot_z(deg: float) -> Matrix3x3:
+    cos, sin = trig(deg)
     return Matrix3x3([
-        [math.cos(math.radians(deg)), math.sin(math.radians(deg)), 0],
-        [-math.sin(math.radians(deg)), math.cos(math.radians(deg)), 0],
+        [cos, sin, 0],
+        [-sin, cos, 0],
         [0, 0, 1]
     ])
+
@@ -1,26 +1,127 @@
-from math3d import Camera, Matrix3x3, Polygon, Triangle, Vector2, Vector3, rot_x, rot_y, rot_z
-from cube import Center, Corner, Edge, RubiksCube
+from math3d import Camera, Matrix3x3, Quad, Vector2, Vector3, rot_x, rot_y, rot_z
+from cube import FRAME_TIME, Center, Corner, Edge, RubiksCube
+from governor import Governor
+from journal import Journal
 import os; os.environ["PYGAME_HIDE_SUPPORT_PROMPT"] = "1"
-import sys
+import functools, math, sys, time
 import pygame
 import tkinter
 from tkinter.filedialog import askopenfilename, asksaveasfilename
 from tkinter.messagebox import showwarning
 
 
-def bubble_sort(to_sort: list) -> None:
-    # sort list in-place w/ bubble sort algorithm
-    swapped = True
-    while swapped:
-        swapped = False
-        for i, val in enumerate(to_sort):
-            try:
-                if val[0] > to_sort[i + 1][0]:
-                    to_sort[i], to_sort[i + 1] = to_sort[i + 1], to_sort[i]
-                    swapped = True
+@functools.lru_cache(maxsize=None)
+def draw_order(layers: int, eye: tuple, axis: int) -> tuple:
+    # back to front order of the grid positions seen from the camera's cell, as slices along an axis
+    # eye is the camera's index on each axis of the grid, -1 or layers when it is outside the cube on that side
+    # the cube is a convex grid of pieces, so a piece can only hide pieces that are no closer to the eye on any axis
+    slices = []
+    for index in sorted(range(layers), key=lambda index: -abs(index - eye[axis])):
+        positions = [
+            (x, y, z) for z in range(layers) for y in range(layers) for x in range(layers)
+            if (x, y, z)[axis] == index
+        ]
+        positions.sort(key=lambda pos: -sum(abs(v - e) for v, e in zip(pos, eye)))
+        slices.append((index, tuple(positions)))
+
+    return tuple(slices)
+
+
+@functools.lru_cache(maxsize=None)
+def draw_runs(layers: int, eye: tuple, turning: tuple) -> tuple:
+    # draw order split into runs of still and turning slices, each still run can be drawn to one surface
+    runs = []
+    for index, positions in draw_order(layers, eye, turning[0][0] if turning else 0):
+        moving = any(index == other for _, other in turning)
+        if runs and runs[-1][0] == moving:
+            runs[-1][1].extend(positions)
+
+        else:
+            runs.append((moving, list(positions)))
+
+    return tuple((moving, tuple(positions)) for moving, positions in runs)
+
+
+def camera_polys(piece, view_rotation: Matrix3x3, cam: Camera, backfaces: bool, front: tuple=None) -> list:
+    # stickers of a piece in camera space as [quad, piece, face], backfaces come first as they are behind the
+    # piece's own stickers, front says which stickers face the camera if it is already known
+    tmp_piece = piece.rotated(view_rotation)
+
+    polys = []
+    front_polys = []
+    for face in range(len(piece.shape)):
+        if front is not None and not front[face] and not backfaces:
+            # culled without building the sticker at all
+            continue
+
+        poly = tmp_piece.sticker(face)
+        if front is None:
+            backface = (poly.points[0] - cam.pos).dot(poly.normal) > 0
+
+        else:
+            backface = not front[face]
+
+        # remove backfaces when cube isn't moving to maximise frame rate
+        # backfaces are otherwise coloured in black
+        if backface and not backfaces:
+            continue
+
+        # convert world space sticker to camera space
+        new_poly = Quad(*(cam.world_to_camera(point) for point in poly.points), poly.col if not backface else "#000000")
+        (polys if backface else front_polys).append([new_poly, piece, face])
+
+    return polys + front_polys
+
+
+def sides(piece) -> tuple:
+    # side of the cube each sticker of a piece out of a turn is on, as an axis and whether it points along it
+    result = []
+    for normal in piece.normals:
+        normal = piece.matrix * normal
+        axis = max(range(3), key=lambda axis: abs((normal.i, normal.j, normal.k)[axis]))
+        result.append((axis, (normal.i, normal.j, normal.k)[axis] > 0))
+
+    return tuple(result)
+
 
-            except IndexError:
-                break
+def depth(poly: Quad) -> float:
+    # average distance of the sticker's corners from the camera
+    return sum(point.magnitude for point in poly.points) / 4
+
+
+def project(poly: Quad, cam: Camera, dimensions: list) -> list:
+    # screen points of a camera space sticker
+    return [[vec.i, vec.j] for vec in (cam.project2d(point, *dimensions) for point in poly.points)]
+
+
+def draw_static(polys: list, cam: Camera, dimensions: list, outlines: bool) -> pygame.Surface:
+    # rasterise polygons that don't move to a transparent surface to be drawn over again
+    surface = pygame.Surface(dimensions, pygame.SRCALPHA)
+    for poly, _, _ in polys:
+        points = project(poly, cam, dimensions)
+        pygame.draw.polygon(surface, poly.col, points, width=10 if wireframe else 0)
+        if outlines:
+            pygame.draw.lines(surface, "#000000", True, points, width=5)
+
+    return surface
+
+
+def draw_ids(polys: list, dimensions: list) -> pygame.Surface:
+    # offscreen pick buffer with each projected polygon filled with its index plus one as a colour, 0 is empty
+    surface = pygame.Surface(dimensions, depth=32)
+    for i, points in enumerate(polys, 1):
+        pygame.draw.polygon(surface, ((i >> 16) & 255, (i >> 8) & 255, i & 255), points)
+
+    return surface
+
+
+def pick(surface: pygame.Surface, pos: tuple) -> int:
+    # index plus one of the polygon drawn at a point of a pick buffer, 0 if there is none
+    if not surface.get_rect().collidepoint(pos):
+        return 0
+
+    col = surface.get_at([int(v) for v in pos])
+    return (col.r << 16) | (col.g << 8) | col.b
 
 
 def sign(p1: list, p2: list, p3: list) -> float:
@@ -53,6 +154,16 @@ dimensions = [800, 450]
 
 wireframe = False
 
+# while a slice turns the still pieces are drawn once to surfaces, and only the turning slice is drawn every frame
+cache_static = True
+
+# most frames drawn a second while anything changes, and longest to sleep in milliseconds while nothing does
+max_fps = 60
+idle_wait = 250
+
+# drawing quality is stepped down while frames take longer than max_fps allows, and back up when they are quick again
+adaptive_quality = True
+
 if __name__ == "__main__":
     pygame.font.init()
     font = pygame.font.SysFont("Arial", 12)
@@ -78,11 +189,34 @@ if __name__ == "__main__":
 
     cube3x3 = RubiksCube(12, 3, 125)
     cube2x2 = RubiksCube(12, 2, 125)
-    cube = cube3x3
 
     global_rotation3x3 = Matrix3x3([[1, 0, 0], [0, 1, 0], [0, 0, 1]])
     global_rotation2x2 = Matrix3x3([[1, 0, 0], [0, 1, 0], [0, 0, 1]])
 
+    # carry on from where the last session stopped, moves are journaled as they are made
+    journal = Journal(os.path.join(os.path.expanduser("~"), ".rubiks-cube-solver"))
+    for recovered, rotation in journal.recover():
+        if recovered.layers == 3:
+            cube3x3.running = False
+            cube3x3, global_rotation3x3 = recovered, rotation
+
+        elif recovered.layers == 2:
+            cube2x2.running = False
+            cube2x2, global_rotation2x2 = recovered, rotation
+
+    cube = cube3x3
+
+    def session_state() -> str:
+        # both cubes in the save file format
+        return cube3x3.save_state(global_rotation3x3) + "\n" + cube2x2.save_state(global_rotation2x2)
+
+    def scene() -> tuple:
+        # everything drawn that can change without an event, frames are only drawn when this or an event changes it
+        return (
+            cube, global_rotation3x3, global_rotation2x2, cube.tmp_pieces, cube.view_frame, cube.history_index,
+            len(cube.history), cube.moving, tuple(dimensions), wireframe
+        )
+
     dragging = False
     dragging_piece = False
     piece_selected = False
@@ -94,7 +228,16 @@ if __name__ == "__main__":
     back_arrow_selected = False
     forward_arrow_selected = False
 
+    # slider for jumping through the move history
+    slider_selected = False
+    scrubbing = False
+
     fps_counter = pygame.time.Clock()
+    governor = Governor(1 / max_fps)
+
+    # surfaces of the still pieces for the turn being drawn, and what they were drawn from
+    static_key = None
+    static_surfaces = []
 
     btn_not_selected = (255, 255, 255)
     btn_selected = (200, 200, 200)
@@ -104,9 +247,31 @@ if __name__ == "__main__":
     save_selected = False
     load_selected = False
 
+    # scene of the last frame drawn
+    drawn = None
+
+    # side of the cube each sticker of a shown piece is on
+    piece_sides = {}
+
+    # buffer of sticker indices for picking, what it was drawn from and the sticker under the mouse
+    pick_scene = None
+    pick_buffer = None
+    pick_targets = []
+    hovered = None
+
     running = True
     while running:
-        for event in pygame.event.get():
+        events = pygame.event.get()
+        animating = cube.moving or cube.moving_queue
+        if not events and not animating and scene() == drawn:
+            # the last frame is still up to date, sleep until something happens instead of drawing it again
+            event = pygame.event.wait(idle_wait)
+            events = [] if event.type == pygame.NOEVENT else [event]
+
+        # hovering is only tested again when the mouse moves
+        moved = any(event.type == pygame.MOUSEMOTION for event in events)
+
+        for event in events:
             if event.type == pygame.QUIT:
                 # handle close button event
                 running = False
@@ -152,9 +317,7 @@ if __name__ == "__main__":
                                 cube.rotate(move, True, False)
 
                         elif save_selected:
-                            state = cube3x3.save_state(global_rotation3x3)
-                            state += "\n"
-                            state += cube2x2.save_state(global_rotation2x2)
+                            state = session_state()
 
                             name = asksaveasfilename(initialfile="rubiks cube.save", defaultextension=".save", filetypes=[
                                 ("Save File", "*.save"), ("All files", "*.*")
@@ -185,6 +348,9 @@ if __name__ == "__main__":
                                             "Invalid Save File"
                                         )
 
+                        elif slider_selected:
+                            scrubbing = True
+
                         elif pygame.mouse.get_pos()[1] > 40:
                             # dragging the cube's rotation
                             if piece_selected:
@@ -198,6 +364,7 @@ if __name__ == "__main__":
             if event.type == pygame.MOUSEBUTTONUP:
                 dragging = False
                 dragging_piece = False
+                scrubbing = False
 
             if event.type == pygame.MOUSEMOTION:
                 if dragging:
@@ -211,7 +378,7 @@ if __name__ == "__main__":
                         global_rotation2x2 = delta * global_rotation2x2
 
                 elif dragging_piece:
-                    if cube.moving or cube.moving_threads:
+                    if cube.moving or cube.moving_queue:
                         selected_piece = None
                         dragging_piece = False
                         continue
@@ -912,134 +1079,158 @@ if __name__ == "__main__":
 
                                     drag_face(cube, cam, mouse_delta, vecs)
 
+        if not events and not animating and scene() == drawn:
+            journal.update([cube3x3, cube2x2], session_state)
+            continue
+
+        drawn = scene()
+        frame_start = time.perf_counter()
         display.fill((255, 255, 255))
 
         # line to separate history and cube view
         pygame.draw.line(display, (0, 0, 0), (0, 40), (dimensions[0], 40))
 
+        # whole cube rotations are drawn by turning the frame, not the pieces
+        if cube.layers == 3:
+            global_rotation = global_rotation3x3
+
+        elif cube.layers == 2:
+            global_rotation = global_rotation2x2
+
+        view_rotation = global_rotation * cube.view_frame
+
+        # cell of the cube's grid the camera is in, the frame turns the grid with the pieces so only the global rotation
+        # matters, and the order pieces are drawn in only changes when the camera crosses into another cell
+        eye = Matrix3x3([list(row) for row in zip(*global_rotation.data)]) * cam.pos
+        eye = tuple(
+            max(-1, min(cube.layers, math.floor(v * cube.layers / cube.width + cube.layers / 2)))
+            for v in (eye.i, eye.j, eye.k)
+        )
+
+        # sides of the cube facing the camera, pieces out of a turn only need a lookup for each sticker to be culled
+        local_eye = Matrix3x3([list(row) for row in zip(*view_rotation.data)]) * cam.pos
+        facing = {}
+        for axis, v in enumerate((local_eye.i, local_eye.j, local_eye.k)):
+            facing[(axis, True)] = v > cube.width / 2
+            facing[(axis, False)] = v < -cube.width / 2
+
+        # sides are kept for as long as a piece is shown, only new pieces need them working out
+        shown_sides, piece_sides = piece_sides, {}
+
+        def front(piece) -> tuple:
+            if piece not in piece_sides:
+                piece_sides[piece] = shown_sides[piece] if piece in shown_sides else sides(piece)
+
+            return tuple(facing[side] for side in piece_sides[piece])
+
+        # turning slices are drawn between the still pieces either side of them
+        turning = cube.turning
+        tmp_pieces = cube.tmp_pieces
+        backfaces = (cube.moving and governor.backfaces) or wireframe
+        outlines = governor.outlines
+        cube.frame_time = FRAME_TIME / governor.animation_frames
+        runs = draw_runs(cube.layers, eye, turning)
         to_draw = []
-        for z in cube.tmp_pieces:
-            for y in z:
-                for piece in y:
-                    if piece is None:
-                        continue
+        if cache_static and turning:
+            # still pieces only need drawing again when the view or the pieces shown change
+            static = tuple(
+                tuple(tmp_pieces[z][y][x] for x, y, z in positions) for moving, positions in runs if not moving
+            )
+            view = tuple(map(tuple, view_rotation.data))
+            key = (cube, turning, view, tuple(dimensions), wireframe, governor.level, static)
+            if key != static_key:
+                static_key = key
+                static_surfaces = []
+                for pieces in static:
+                    polys = [
+                        poly for piece in pieces if piece is not None
+                        for poly in camera_polys(piece, view_rotation, cam, backfaces, front(piece))
+                    ]
+                    static_surfaces.append(draw_static(polys, cam, dimensions, outlines))
 
-                    tmp_piece = piece.copy()
-                    if cube.layers == 3:
-                        tmp_piece.rotate(global_rotation3x3)
+            surfaces = iter(static_surfaces)
 
-                    elif cube.layers == 2:
-                        tmp_piece.rotate(global_rotation2x2)
+        else:
+            static_key = None
+            static_surfaces = []
 
-                    for face, poly in enumerate(tmp_piece.polys):
-                        backface = False
-                        if (poly.triangles[0].p1 - cam.pos).dot(poly.normal) > 0:
-                            # remove backfaces when cube isn't moving to maximise frame rate
-                            # backfaces are otherwise coloured in black
-                            if cube.moving or wireframe:
-                                backface = True
+        for moving, positions in runs:
+            if not moving and static_surfaces:
+                # still pieces are picked up from their surface, and can't be selected until the turn is over
+                to_draw.append(next(surfaces))
+                continue
 
-                            else:
-                                continue
-
-                        new_poly = Polygon()
-                        depths = []
-                        for triangle in poly.triangles:
-                            # convert world space triangle to camera space
-                            new_triangle = Triangle(
-                                cam.world_to_camera(triangle.p1),
-                                cam.world_to_camera(triangle.p2),
-                                cam.world_to_camera(triangle.p3),
-                                triangle.col if not backface else "#000000"
-                            )
-                            new_poly.triangles.append(new_triangle)
-
-                            # get the average distance of the camera space triangle from the camera
-                            avg_depth = new_triangle.p1.magnitude
-                            avg_depth += new_triangle.p2.magnitude
-                            avg_depth += new_triangle.p3.magnitude
-                            avg_depth /= 3
-                            depths.append(avg_depth)
-
-                        overall_avg_depth = sum(depths) / len(depths)
-                        to_draw.append([overall_avg_depth, new_poly, piece, face])
+            polys = []
+            for x, y, z in positions:
+                piece = tmp_pieces[z][y][x]
+                if piece is not None:
+                    polys.extend(camera_polys(piece, view_rotation, cam, backfaces, None if moving else front(piece)))
+
+            if moving:
+                # pieces part way through a turn are out of the grid, so these are still sorted by depth
+                polys.sort(key=lambda poly: depth(poly[0]), reverse=True)
+
+            to_draw.extend(polys)
 
         if not dragging_piece or cube.moving:
             piece_selected = False
             selected_piece = None
             dragging_piece = False
 
-        bubble_sort(to_draw)
-        for poly in reversed(to_draw):
-            # project 3D camera space points to 2D plane
-
-            cached_points = {}
+        # project 3D camera space points to 2D plane
+        coords = Vector2(*pygame.mouse.get_pos())
+        projected = [
+            poly if isinstance(poly, pygame.Surface) else project(poly[0], cam, dimensions) for poly in to_draw
+        ]
 
-            selected = False
-            if not dragging:
-                for tri in poly[1].triangles:
-                    # https://stackoverflow.com/a/2049593
-                    # construct a ray to detect intersections with polygons from mouse position
-                    if selected:
-                        continue
+        if cube.moving or dragging:
+            # nothing can be picked up while the cube moves or is being turned around
+            pick_scene = None
+            hovered = None
 
-                    # project 3D camera space points to 2D plane
-                    points = (
-                        cam.project2d(tri.p1, *dimensions),
-                        cam.project2d(tri.p2, *dimensions),
-                        cam.project2d(tri.p3, *dimensions)
-                    )
-
-                    cached_points[tri] = points
-
-                    # calculate if mouse intersecting triangle
-                    coords = Vector2(*pygame.mouse.get_pos())
-                    deltas = [
-                        sign(coords, points[0], points[1]),
-                        sign(coords, points[1], points[2]),
-                        sign(coords, points[2], points[0])
-                    ]
-                    neg = any(map(lambda x: x < 0, deltas))
-                    pos = any(map(lambda x: x > 0, deltas))
-                    if not selected:
-                        if dragging_piece:
-                            if poly[2] == selected_piece[0] and poly[3] == selected_piece[1]:
-                                selected = True
-
-                        else:
-                            selected = not (neg and pos)
-
-                    if not piece_selected and selected:
-                        piece_selected = True
-                        selected_piece = poly[2:]
-
-            for tri in poly[1].triangles:
-                try:
-                    points = cached_points[tri]
-
-                except KeyError:
-                    # project 3D camera space points to 2D plane
-                    points = (
-                        cam.project2d(tri.p1, *dimensions),
-                        cam.project2d(tri.p2, *dimensions),
-                        cam.project2d(tri.p3, *dimensions)
-                    )
-
-                # draw shapes
-                points = [[vec.i, vec.j] for vec in points]
-                if not selected:
-                    pygame.draw.polygon(display, tri.col, points, width=10 if wireframe else 0)
-
-                else:
-                    pygame.draw.polygon(display, cube.dimmed[tri.col], points, width=10 if wireframe else 0)
-
-                pygame.draw.lines(display, "#000000", wireframe, points, width=5)
-
-        # display fps in top left
-        fps_counter.tick()
+        else:
+            if pick_scene != drawn:
+                # stickers only need drawing to the pick buffer again when the view changes
+                pick_scene = drawn
+                pick_targets = [poly[1:] for poly in to_draw if not isinstance(poly, pygame.Surface)]
+                stickers = [points for points in projected if not isinstance(points, pygame.Surface)]
+                pick_buffer = draw_ids(stickers, dimensions)
+                moved = True
+
+            if moved:
+                index = pick(pick_buffer, (coords.i, coords.j))
+                hovered = tuple(pick_targets[index - 1]) if index else None
+
+        if not dragging_piece and hovered is not None:
+            piece_selected = True
+            selected_piece = hovered
+
+        for poly, points in zip(to_draw, projected):
+            if isinstance(poly, pygame.Surface):
+                display.blit(poly, (0, 0))
+                continue
+
+            # draw shapes, one fill and one outline for each sticker
+            selected = piece_selected and poly[1] == selected_piece[0] and poly[2] == selected_piece[1]
+            if not selected:
+                pygame.draw.polygon(display, poly[0].col, points, width=10 if wireframe else 0)
+
+            else:
+                pygame.draw.polygon(display, cube.dimmed[poly[0].col], points, width=10 if wireframe else 0)
+
+            if outlines:
+                pygame.draw.lines(display, "#000000", True, points, width=5)
+
+        # display fps in top left, and the drawing quality when it has been lowered
+        frame_time = time.perf_counter() - frame_start
+        fps_counter.tick(max_fps)
+        resumed = time.perf_counter()
         fps = fps_counter.get_fps()
         fps_text = font.render(f"FPS: {int(fps)}", True, (0, 0, 0))
         display.blit(fps_text, (5, 5))
+        if governor.level:
+            quality_text = font.render(f"Quality: {governor}", True, (127, 127, 127))
+            display.blit(quality_text, (5, 45))
 
         # display move history and controls
         if cube.history[cube.history_index] is not None:
@@ -1109,6 +1300,29 @@ if __name__ == "__main__":
             list(map(lambda x: [x.i, x.j], forward_arrow_points))
         )
 
+        # history slider, jumps straight to the move under the mouse while held
+        slider_start = 3 * dimensions[0] / 12
+        slider_length = 6 * dimensions[0] / 12
+        slider_y = 19 * dimensions[1] / 20
+        slider_box = pygame.rect.Rect(slider_start - 8, slider_y - 10, slider_length + 16, 20)
+        slider_selected = slider_box.collidepoint(coords.i, coords.j)
+
+        last_index = len(cube.history) - 1
+        if scrubbing and last_index:
+            index = round(min(max((coords.i - slider_start) / slider_length, 0), 1) * last_index)
+            if index != cube.history_index:
+                cube.jump(index)
+
+        pygame.draw.line(
+            display, (190, 190, 190), (slider_start, slider_y), (slider_start + slider_length, slider_y), width=4
+        )
+        pygame.draw.circle(
+            display,
+            (100, 100, 100) if slider_selected or scrubbing else (190, 190, 190),
+            (slider_start + (cube.history_index / last_index if last_index else 0) * slider_length, slider_y),
+            8
+        )
+
         # scramble button
         scramble_btn = pygame.rect.Rect(dimensions[0] / 12 - 2, 7, 88, 25)
 
@@ -1271,5 +1485,12 @@ if __name__ == "__main__":
 
         pygame.display.update()
 
+        if adaptive_quality:
+            # time spent drawing, leaving out waiting for the frame rate cap
+            governor.update(frame_time + time.perf_counter() - resumed)
+
+        journal.update([cube3x3, cube2x2], session_state)
+
+    journal.close([cube3x3, cube2x2], session_state)
     pygame.quit()
     cube.running = False
@@ -0,0 +1,628 @@
+import facelets
+import functools, itertools, multiprocessing
+import numpy as np
+
+# every piece is tracked by the rotation that takes it from its solved position, turning around the cube center
+ROTATIONS = facelets.ROTATIONS
+ROTATION_INDEX = {rotation: i for i, rotation in enumerate(ROTATIONS)}
+PRODUCT = [[ROTATION_INDEX[facelets.compose(a, b)] for b in ROTATIONS] for a in ROTATIONS]
+INVERSE = [ROTATION_INDEX[facelets.inverse(rotation)] for rotation in ROTATIONS]
+
+# distance stored for states a goal can't be reached from
+UNREACHABLE = 255
+
+# pieces sharing a distance table in the search estimate
+GROUP_SIZE = 4
+
+
+def doubled(pos: tuple, layers: int) -> tuple:
+    # grid position relative to the cube center, doubled to keep it an integer
+    return tuple(2 * v - layers + 1 for v in pos)
+
+
+def grid(pos: tuple, layers: int) -> tuple:
+    return tuple((v + layers - 1) // 2 for v in pos)
+
+
+def slot(home: tuple, rotation: int, layers: int) -> tuple:
+    # grid position of the piece from home turned by a rotation
+    return grid(facelets.transform(ROTATIONS[rotation], doubled(home, layers)), layers)
+
+
+@functools.lru_cache(maxsize=None)
+def pieces(layers: int) -> dict:
+    # outward normals of the stickers on every piece, keyed by the piece's home position
+    found = {}
+    for pos, normal in facelets.layout(layers):
+        found.setdefault(pos, []).append(normal)
+
+    return {pos: tuple(normals) for pos, normals in found.items()}
+
+
+def faces(home: tuple, layers: int) -> str:
+    # faces a piece has stickers on when solved
+    normals = pieces(layers)[home]
+    return "".join(face for face in facelets.FACES if facelets.NORMALS[face] in normals)
+
+
+@functools.lru_cache(maxsize=None)
+def moves(layers: int) -> tuple:
+    # outer face turns, inner layers are only needed to reach pieces on bigger cubes
+    depths = range(1 if layers < 4 else (layers + 1) // 2)
+    found = []
+    for face in ["U", "D", "R", "L", "F", "B"]:
+        for depth in depths:
+            if face in "DLB" and layers % 2 and depth == layers // 2:
+                # the middle layer is turned from the first face of its axis
+                continue
+
+            if face in "DLB" and not layers % 2 and depth == 0:
+                # even cubes have no fixed centers, the back bottom left corner is kept still instead
+                continue
+
+            for turns in range(1, 4):
+                found.append((face, turns, depth))
+
+    return tuple(found)
+
+
+@functools.lru_cache(maxsize=None)
+def layer_key(layers: int, move: tuple) -> tuple:
+    # axis and layer index a move turns, moves on one axis commute
+    face, _, depth = move
+    _, axis, far_side = facelets.QUARTER_TURNS[face]
+    return axis, layers - depth - 1 if far_side else depth
+
+
+@functools.lru_cache(maxsize=None)
+def transitions(layers: int, home: tuple) -> tuple:
+    # rotation of the piece after each move, for each rotation it could have before it
+    table = []
+    for move in moves(layers):
+        face, turns, _ = move
+        axis, layer = layer_key(layers, move)
+        turn = ROTATION_INDEX[facelets.QUARTER_TURNS[face][0]]
+        for _ in range(turns - 1):
+            turn = PRODUCT[ROTATION_INDEX[facelets.QUARTER_TURNS[face][0]]][turn]
+
+        table.append(tuple(
+            PRODUCT[turn][rotation] if slot(home, rotation, layers)[axis] == layer else rotation
+            for rotation in range(len(ROTATIONS))
+        ))
+
+    return tuple(table)
+
+
+@functools.lru_cache(maxsize=None)
+def distances(layers: int, goal: tuple, costs: tuple) -> bytes:
+    # cheapest cost from every combined rotation of a small group of pieces to the goal, found backwards from the goal
+    size = len(ROTATIONS)
+    count = len(goal)
+    places = size ** np.arange(count - 1, -1, -1)
+    tables = [np.array(transitions(layers, home), dtype=np.intp) for home, _ in goal]
+
+    table = np.full(size ** count, UNREACHABLE, dtype=np.uint8)
+    starts = np.array(list(itertools.product(*(sorted(allowed) for _, allowed in goal))), dtype=np.intp).reshape(-1, count)
+    table[starts @ places] = 0
+
+    # the move list holds every inverse, so searching forward from the goal gives the distance to it
+    cost = 0
+    while True:
+        frontier = np.flatnonzero(table == cost)
+        if not frontier.size and not ((table > cost) & (table != UNREACHABLE)).any():
+            break
+
+        rotations = [frontier // place % size for place in places]
+        for i, move_cost in enumerate(costs):
+            codes = sum(piece_table[i][rotation] * place for piece_table, rotation, place in zip(tables, rotations, places))
+            np.minimum.at(table, codes, cost + move_cost)
+
+        cost += 1
+
+    return table.tobytes()
+
+
+def reference(layers: int, state: dict, corner: bool=False) -> int:
+    # rotation the goal is solved relative to, found from the middle centers or the back bottom left corner
+    n = layers - 1
+    if corner or not layers % 2:
+        return [rotation for home, rotation in state.items() if slot(home, rotation, layers) == (0, 0, n)][0]
+
+    up, front = state[(n // 2, n, n // 2)], state[(n // 2, n // 2, 0)]
+    return [
+        rotation for rotation in range(len(ROTATIONS))
+        if slot((n // 2, n, n // 2), rotation, layers) == slot((n // 2, n, n // 2), up, layers)
+        and slot((n // 2, n // 2, 0), rotation, layers) == slot((n // 2, n // 2, 0), front, layers)
+    ][0]
+
+
+def placed(layers: int, home: tuple, rotation: int) -> frozenset:
+    # rotations leaving a piece's stickers exactly where this rotation does, the middle centers can spin freely
+    target = [facelets.transform(ROTATIONS[rotation], normal) for normal in pieces(layers)[home]]
+    return frozenset(
+        other for other in range(len(ROTATIONS))
+        if slot(home, other, layers) == slot(home, rotation, layers)
+        and [facelets.transform(ROTATIONS[other], normal) for normal in pieces(layers)[home]] == target
+    )
+
+
+@functools.lru_cache(maxsize=None)
+def spun(layers: int, home: tuple) -> tuple:
+    # for each rotation, the lowest one placing the piece's stickers the same way, so center spins all count as one
+    return tuple(min(placed(layers, home, rotation)) for rotation in range(len(ROTATIONS)))
+
+
+@functools.lru_cache(maxsize=None)
+def orbit(layers: int, home: tuple) -> tuple:
+    # centers that a spin of their face swaps look the same, each is tracked as the lowest of them and the rotation
+    # taking that one to its home, other pieces stand for themselves
+    normals = pieces(layers)[home]
+    if len(normals) > 1:
+        return home, ROTATION_INDEX[facelets.IDENTITY]
+
+    spins = [i for i, rotation in enumerate(ROTATIONS) if facelets.transform(rotation, normals[0]) == normals[0]]
+    first = min(slot(home, spin, layers) for spin in spins)
+    return first, [spin for spin in spins if slot(first, spin, layers) == home][0]
+
+
+def located(layers: int, home: tuple, rotation: int) -> frozenset:
+    # rotations leaving a piece in the same slot however it is twisted
+    return frozenset(other for other in range(len(ROTATIONS)) if slot(home, other, layers) == slot(home, rotation, layers))
+
+
+def apply(layers: int, state: dict, sequence: list) -> dict:
+    # rotations of the tracked pieces after a sequence of moves
+    index = {move: i for i, move in enumerate(moves(layers))}
+    state = dict(state)
+    for move in sequence:
+        i = index[move]
+        for home in state:
+            state[home] = transitions(layers, home)[i][state[home]]
+
+    return state
+
+
+class Search:
+    def __init__(self, layers: int, goal: tuple, costs: tuple, still: tuple=None):
+        # IDA* over the pieces in goal, each paired with the rotations it may end in, never turning the slot still
+        self.homes = [home for home, _ in goal]
+        self.size = len(ROTATIONS)
+
+        # groups of four pieces give a far better estimate than single pieces and their tables stay small
+        self.groups = []
+        for i in range(0, len(goal), GROUP_SIZE):
+            group = goal[i:i + GROUP_SIZE]
+            self.groups.append((range(i, i + len(group)), distances(layers, group, costs)))
+
+        self.moves = moves(layers)
+        self.tables = [transitions(layers, home) for home in self.homes]
+        self.keys = [layer_key(layers, move) for move in self.moves]
+        self.choices = [(i, move_cost) for i, move_cost in enumerate(costs) if still is None or still[self.keys[i][0]] != self.keys[i][1]]
+
+    def estimate(self, rotations: list) -> int:
+        best = 0
+        for members, table in self.groups:
+            code = 0
+            for i in members:
+                code = code * self.size + rotations[i]
+
+            if table[code] > best:
+                best = table[code]
+
+        return best
+
+    def branches(self, rotations: list, last: int) -> list:
+        # moves worth trying after the last one, with the rotations they lead to
+        found = []
+        for i, move_cost in self.choices:
+            if last is not None and self.keys[i][0] == self.keys[last][0] and self.keys[i][1] <= self.keys[last][1]:
+                # skip turning a layer twice and only take commuting moves in one order
+                continue
+
+            found.append((i, move_cost, [table[i][rotation] for table, rotation in zip(self.tables, rotations)]))
+
+        return found
+
+    def search(self, rotations: list, cost: int, bound: int, last: int, path: list, stop=None) -> int:
+        # depth first search under the bound, returns -1 once path reaches the goal or the lowest bound that went over
+        h = self.estimate(rotations)
+        if cost + h > bound:
+            return cost + h
+
+        if h == 0:
+            return -1
+
+        if stop is not None and stop.is_set():
+            # another worker found a solution at this bound
+            return UNREACHABLE
+
+        lowest = UNREACHABLE
+        for i, move_cost, new in self.branches(rotations, last):
+            path.append(self.moves[i])
+            found = self.search(new, cost + move_cost, bound, i, path, stop)
+            if found < 0:
+                return found
+
+            path.pop()
+            lowest = min(lowest, found)
+
+        return lowest
+
+    def split(self, rotations: list, bound: int, plies: int, cost: int=0, last: int=None, path: tuple=()) -> tuple:
+        # expand the first few moves, giving a solution found on the way or the prefixes left to search and the lowest
+        # bound of those cut off
+        h = self.estimate(rotations)
+        if cost + h > bound:
+            return None, [], cost + h
+
+        if h == 0:
+            return list(path), [], -1
+
+        if not plies:
+            return None, [(rotations, cost, last, path)], UNREACHABLE
+
+        prefixes = []
+        lowest = UNREACHABLE
+        for i, move_cost, new in self.branches(rotations, last):
+            solution, found, over = self.split(new, bound, plies - 1, cost + move_cost, i, path + (self.moves[i],))
+            if solution is not None:
+                return solution, [], -1
+
+            prefixes += found
+            lowest = min(lowest, over)
+
+        return None, prefixes, lowest
+
+
+@functools.lru_cache(maxsize=8)
+def prepared(layers: int, goal: tuple, costs: tuple, still: tuple) -> Search:
+    # searches are reused between bounds and by every prefix a worker process is given
+    return Search(layers, goal, costs, still)
+
+
+# set in each worker process so siblings stop once one finds a solution
+stop_event = None
+
+
+def share(stop) -> None:
+    global stop_event
+    stop_event = stop
+
+
+def workers(processes: int) -> tuple:
+    # a pool of worker processes and the event that stops them, made once and shared by every stage of a solve
+    stop = multiprocessing.Event()
+    return multiprocessing.Pool(processes, initializer=share, initargs=(stop,)), stop
+
+
+def search_prefix(task: tuple) -> tuple:
+    # run in a worker process, searches under one prefix of the moves
+    layers, goal, costs, still, bound, (rotations, cost, last, path) = task
+    if stop_event.is_set():
+        return UNREACHABLE, None
+
+    path = list(path)
+    found = prepared(layers, goal, costs, still).search(rotations, cost, bound, last, path, stop_event)
+    return found, path if found < 0 else None
+
+
+def fixed(layers: int, home: tuple) -> bool:
+    # whether no move turns the piece
+    return not any(rotation != i for table in transitions(layers, home) for i, rotation in enumerate(table))
+
+
+def tracked(layers: int, goal: dict) -> tuple:
+    # the pieces of a goal a search follows, leaving out those no move turns and those allowed every rotation
+    return tuple((home, frozenset(allowed)) for home, allowed in goal.items() if not fixed(layers, home) and len(allowed) < len(ROTATIONS))
+
+
+def solve(layers: int, state: dict, goal: dict, costs: tuple, still: tuple=None, max_cost: int=30, processes: int=1, pool: tuple=None) -> list:
+    # cheapest moves taking every piece in goal to one of its allowed rotations, never turning the slot still, pool is
+    # a pool and stop event from workers to search with instead of starting new processes
+    for home, allowed in goal.items():
+        if fixed(layers, home) and state[home] not in allowed:
+            # pieces no move can turn are either already in place or out of reach
+            raise ValueError("goal can't be reached from this state")
+
+    goal = tracked(layers, goal)
+    if not goal:
+        return []
+
+    search = prepared(layers, goal, costs, still)
+    rotations = [state[home] for home in search.homes]
+    bound = search.estimate(rotations)
+    if pool is not None:
+        return solve_parallel(layers, goal, costs, still, rotations, bound, max_cost, pool)
+
+    if processes > 1:
+        pool, stop = workers(processes)
+        with pool:
+            return solve_parallel(layers, goal, costs, still, rotations, bound, max_cost, (pool, stop))
+
+    path = []
+    while bound <= max_cost:
+        bound = search.search(rotations, 0, bound, None, path)
+        if bound < 0:
+            return path
+
+    raise ValueError("goal can't be reached from this state")
+
+
+def solve_parallel(layers: int, goal: tuple, costs: tuple, still: tuple, rotations: list, bound: int, max_cost: int, pool: tuple) -> list:
+    # the tree is split by its first two moves and workers search each prefix under the same bound, so only whole
+    # bounds run in parallel and the next one starts once every prefix has been searched under this one. Workers share
+    # nothing but the stop event, set by the first solution found so the prefixes still running or waiting give up
+    pool, stop = pool
+    search = prepared(layers, goal, costs, still)
+    while bound <= max_cost:
+        solution, prefixes, lowest = search.split(rotations, bound, 2)
+        if solution is not None:
+            return solution
+
+        stop.clear()
+        tasks = [(layers, goal, costs, still, bound, prefix) for prefix in prefixes]
+        for found, path in pool.imap_unordered(search_prefix, tasks):
+            if found < 0 and solution is None:
+                solution = path
+                stop.set()
+
+            elif found >= 0:
+                lowest = min(lowest, found)
+
+        if solution is not None:
+            return solution
+
+        bound = lowest
+
+    raise ValueError("goal can't be reached from this state")
+
+
+def solve_stages(layers: int, state: dict, stages: list, costs: tuple, processes: int=1) -> list:
+    # solve each stage in turn while keeping the pieces of earlier stages in place
+    pool = None
+    if processes > 1:
+        # build every stage's search and distance tables first, so the workers have them from when they are forked
+        goal = {}
+        for stage, still in stages:
+            goal.update(stage)
+            followed = tracked(layers, goal)
+            if followed:
+                prepared(layers, followed, costs, still)
+
+        pool = workers(processes)
+
+    try:
+        solution = []
+        goal = {}
+        for stage, still in stages:
+            goal.update(stage)
+            sequence = solve(layers, state, goal, costs, still, pool=pool)
+            state = apply(layers, state, sequence)
+            solution += sequence
+
+        return solution
+
+    finally:
+        if pool is not None:
+            pool[0].terminate()
+
+
+def relative(layers: int, state: dict, target: dict) -> dict:
+    # state relabelled so the target counts as solved, each piece is named after the target piece in its slot
+    return {slot(home, target[home], layers): PRODUCT[rotation][INVERSE[target[home]]] for home, rotation in state.items()}
+
+
+def facelet_string(layers: int, state: dict) -> str:
+    # facelet string of a state, every sticker keeps the face it belongs to
+    lookup = facelets.index(layers)
+    colours = {normal: face for face, normal in facelets.NORMALS.items()}
+    found = [""] * (6 * layers ** 2)
+    for home, rotation in state.items():
+        for normal in pieces(layers)[home]:
+            found[lookup[(slot(home, rotation, layers), facelets.transform(ROTATIONS[rotation], normal))]] = colours[normal]
+
+    return "".join(found)
+
+
+def meet(layers: int, start: dict, target: dict, quarter: bool=False, max_depth: int=12, max_states: int=1500000) -> list:
+    # fewest moves from start to target, growing a frontier from each end one level at a time, gives None once the
+    # moves or states needed go over the limits
+    n = layers - 1
+    still = None if layers % 2 else (0, 0, n)
+    choices = [
+        i for i, move in enumerate(moves(layers))
+        if not (quarter and move[1] == 2) and (still is None or still[layer_key(layers, move)[0]] != layer_key(layers, move)[1])
+    ]
+
+    # both states are turned so the middle centers, or the back bottom left corner on even cubes, are solved
+    frames = [reference(layers, state) if layers % 2 else state[still] for state in [start, target]]
+    # states whose stickers match have to meet, so the middle centers are kept without their spin and centers that
+    # look the same are each stored as where they put the first of them, kept in order within their group
+    start, target = [
+        {
+            home: spun(layers, orbit(layers, home)[0])[PRODUCT[PRODUCT[INVERSE[frame]][rotation]][orbit(layers, home)[1]]]
+            for home, rotation in state.items()
+        }
+        for frame, state in zip(frames, [start, target])
+    ]
+
+    firsts = {home: orbit(layers, home)[0] for home in start}
+    def moved(first: tuple) -> bool:
+        return any(spun(layers, first)[transitions(layers, first)[i][rotation]] != rotation for i in choices for rotation in set(spun(layers, first)))
+
+    homes = sorted((home for home in start if moved(firsts[home])), key=lambda home: (firsts[home], home))
+    if sorted((firsts[home], start[home]) for home in start if home not in homes) != sorted((firsts[home], target[home]) for home in target if home not in homes):
+        return None
+
+    tables = np.array([[[spun(layers, firsts[home])[rotation] for rotation in transitions(layers, firsts[home])[i]] for home in homes] for i in choices], dtype=np.uint8)
+    pieces = np.arange(len(homes))
+    weights = np.random.default_rng(0).integers(1, 2 ** 63, len(homes), dtype=np.uint64)
+    groups = []
+    for _, members in itertools.groupby(range(len(homes)), key=lambda i: firsts[homes[i]]):
+        members = list(members)
+        if len(members) > 1:
+            groups.append((members[0], members[-1] + 1))
+
+    def hashed(states: np.ndarray) -> np.ndarray:
+        # 64 bit key of each state, sorting these is far quicker than sorting the states themselves
+        keys = np.zeros(len(states), dtype=np.uint64)
+        for column, weight in zip(states.T, weights):
+            keys += column * weight
+
+        return keys
+
+    def settle(states: np.ndarray) -> np.ndarray:
+        # centers that look the same in order, so it doesn't matter which of them is where
+        for begin, end in groups:
+            states[:, begin:end].sort(axis=1)
+
+        return states
+
+    # moves worth making after each move, skipping a layer turned twice and taking commuting moves in one order
+    keys = [layer_key(layers, moves(layers)[i]) for i in choices]
+    after = np.array([[key[0] != last[0] or key[1] > last[1] for key in keys] for last in keys])
+
+    # every level of each side holds its states, the index of the state each came from, the move made to reach it and
+    # the moves worth making next, taken from every move reaching the state so no state is missed a level later
+    sides = [
+        [(settle(np.array([[state[home] for home in homes]], dtype=np.uint8)), None, None, np.ones((1, len(choices)), dtype=bool))]
+        for state in [start, target]
+    ]
+    seen = [[hashed(level[0])] for level, *_ in sides]
+
+    def trace(side: int, depth: int, i: int) -> list:
+        path = []
+        for _, parents, made, _ in sides[side][depth:0:-1]:
+            path.append(moves(layers)[choices[made[i]]])
+            i = parents[i]
+
+        return path[::-1]
+
+    found = (0, 0, 0, 0) if np.array_equal(sides[0][0][0], sides[1][0][0]) else None
+    total = 2
+    while found is None:
+        if len(sides[0]) + len(sides[1]) - 2 >= max_depth:
+            return None
+
+        # grow the smaller frontier
+        side = 0 if len(sides[0][-1][0]) <= len(sides[1][-1][0]) else 1
+        frontier, _, _, allowed = sides[side][-1]
+        if total + np.count_nonzero(allowed) > max_states:
+            # give up before building a level that could go over the limit, so falling back doesn't wait for it
+            return None
+
+        parents, made = np.nonzero(allowed)
+        states = settle(tables[made[:, None], pieces, frontier[parents]])
+
+        # one of each state, keeping the first way it was reached and every move worth making after any of them
+        keys = hashed(states)
+        order = np.argsort(keys, kind="stable")
+        keys = keys[order]
+        starts = np.flatnonzero(np.concatenate(([True], keys[1:] != keys[:-1])))
+        keys, first, follows = keys[starts], order[starts], np.logical_or.reduceat(after[made[order]], starts)
+        new = ~np.isin(keys, np.concatenate(seen[side]))
+        keys, first, follows = keys[new], first[new], follows[new]
+
+        total += len(keys)
+        sides[side].append((states[first], parents[first], made[first], follows))
+        seen[side].append(keys)
+
+        # the first level of the other side sharing a state gives the shortest route, checked against the states as
+        # different states can share a key
+        for depth, other in enumerate(seen[1 - side]):
+            _, mine, theirs = np.intersect1d(keys, other, return_indices=True)
+            for i, j in zip(mine, theirs):
+                if np.array_equal(sides[side][-1][0][i], sides[1 - side][depth][0][j]):
+                    found = (len(sides[side]) - 1, i, depth, j) if side == 0 else (depth, j, len(sides[side]) - 1, i)
+                    break
+
+            if found is not None:
+                break
+
+    forward, backward = trace(0, *found[:2]), trace(1, *found[2:])
+    path = forward + [(face, 4 - turns, depth) for face, turns, depth in reversed(backward)]
+
+    # moves were found with the start turned to its reference, turn each face back to where it really is
+    faces = {
+        face: [other for other, normal in facelets.NORMALS.items() if normal == facelets.transform(ROTATIONS[frames[0]], facelets.NORMALS[face])][0]
+        for face in facelets.FACES
+    }
+
+    return [(faces[face], turns, depth) for face, turns, depth in path]
+
+
+def sticker_goal(layers: int, mask: str) -> dict:
+    # goal from a facelet string, any character that isn't a face letter matches every colour
+    mask = "".join(mask.split()).upper()
+    if len(mask) != 6 * layers ** 2:
+        raise ValueError(f"a goal mask needs {6 * layers ** 2} facelets, got {len(mask)}")
+
+    lookup = facelets.index(layers)
+    wildcards = set(mask) - set(facelets.FACES)
+    goal = {}
+    for home, normals in pieces(layers).items():
+        allowed = []
+        for rotation in range(len(ROTATIONS)):
+            pos = slot(home, rotation, layers)
+            if all(
+                mask[lookup[(pos, facelets.transform(ROTATIONS[rotation], normal))]] in (face, *wildcards)
+                for normal, face in zip(normals, faces(home, layers))
+            ):
+                allowed.append(rotation)
+
+        if len(allowed) < len(ROTATIONS):
+            goal[home] = frozenset(allowed)
+
+    return goal
+
+
+def preset(layers: int, name: str, state: dict) -> list:
+    # stages of each named goal and the slot kept still while searching them, built on the yellow face and green side
+    n = layers - 1
+    homes = pieces(layers)
+    rotation = reference(layers, state)
+    middle = [pos for pos in homes if layers % 2 and list(pos).count(n // 2) == 2]
+
+    def select(test):
+        return [pos for pos in homes if test(*pos)]
+
+    def columns(height):
+        # a bottom corner along with the edges above it
+        return [select(lambda x, y, z, cx=cx, cz=cz: (x, z) == (cx, cz) and y < height) for cx in (0, n) for cz in (0, n)]
+
+    cross = select(lambda x, y, z: y == 0 and len(homes[(x, y, z)]) < 3)
+    if name == "cross":
+        stages = [cross]
+
+    elif name == "first_layer":
+        stages = [cross] + columns(1) + [select(lambda x, y, z: y == 0)]
+
+    elif name == "f2l":
+        stages = [cross] + columns(n) + [select(lambda x, y, z: y < n)]
+
+    elif name == "first_block":
+        stages = [
+            select(lambda x, y, z: x == 0 and y < n and 0 < z < n),
+            select(lambda x, y, z: x == 0 and y < n and z == 0),
+            select(lambda x, y, z: x == 0 and y < n)
+        ]
+
+    elif name == "corners":
+        # corners are put together around the back bottom left one like on a 2x2, moving the top ones into their
+        # slots before twisting them one at a time, then the whole set is lined up with the centers
+        corner = reference(layers, state, True)
+        corners = select(lambda x, y, z: len(homes[(x, y, z)]) == 3)
+        top = [pos for pos in corners if pos[1] == n]
+        stages = [({pos: placed(layers, pos, corner)}, (0, 0, n)) for pos in corners if pos[1] == 0]
+        stages.append(({pos: located(layers, pos, corner) for pos in top}, (0, 0, n)))
+        stages += [({pos: placed(layers, pos, corner)}, (0, 0, n)) for pos in top]
+        stages.append(corners)
+
+    else:
+        raise ValueError(f"unknown goal {name!r}")
+
+    # the middle centers of odd cubes fix which way round the goal is
+    return [
+        stage if isinstance(stage, tuple) else ({pos: placed(layers, pos, rotation) for pos in stage}, None)
+        for stage in [middle] + stages
+    ]